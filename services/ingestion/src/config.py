@@ -4,10 +4,42 @@ config.py
 """
 import os
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Literal
 
 VN_TZ = timezone(timedelta(hours=7))
 
+@lru_cache(maxsize=None)
+def _date_range_for_mode(mode: str) -> tuple:
+    """
+    Date range của một MODE, tính một lần mỗi process
+    (datetime.now + strftime không lặp lại ở mỗi lần gọi)
+    """
+    now_vn = datetime.now(VN_TZ)
+    
+    if mode == "BACKFILL":
+        # Lấy toàn bộ dữ liệu lịch sử từ 2021-10-27 đến hôm qua
+        start_date = "2021-10-27"
+        end_date = (now_vn - timedelta(days=1)).strftime("%Y-%m-%d")
+        
+    elif mode == "HOURLY":
+        # Chỉ lấy giờ trước đó của ngày hôm nay
+        # Không cần return date range, sẽ xử lý riêng
+        current_hour = now_vn.replace(minute=0, second=0, microsecond=0)
+        target_hour = current_hour - timedelta(hours=1)
+        return target_hour.strftime("%Y-%m-%d"), target_hour.strftime("%H")
+        
+    elif mode == "COMPACTION":
+        # Compact dữ liệu của ngày hôm qua
+        yesterday = now_vn - timedelta(days=1)
+        start_date = yesterday.strftime("%Y-%m-%d")
+        end_date = start_date
+    
+    else:
+        raise ValueError(f"Unknown MODE: {mode}")
+    
+    return start_date, end_date
+
 class Config:
     """Centralized configuration management"""
     
@@ -60,36 +92,13 @@ class Config:
     @staticmethod
     def get_date_range():
         """
-        Trả về date range dựa trên MODE
+        Trả về date range dựa trên MODE (memoized per process)
         
         Returns:
             tuple: (start_date, end_date) format YYYY-MM-DD
         """
-        now_vn = datetime.now(VN_TZ)
-        mode = Config.get_mode()
-        
-        if mode == "BACKFILL":
-            # Lấy toàn bộ dữ liệu lịch sử từ 2021-10-27 đến hôm qua
-            start_date = "2021-10-27"
-            end_date = (now_vn - timedelta(days=1)).strftime("%Y-%m-%d")
-            
-        elif mode == "HOURLY":
-            # Chỉ lấy giờ trước đó của ngày hôm nay
-            # Không cần return date range, sẽ xử lý riêng
-            current_hour = now_vn.replace(minute=0, second=0, microsecond=0)
-            target_hour = current_hour - timedelta(hours=1)
-            return target_hour.strftime("%Y-%m-%d"), target_hour.strftime("%H")
-            
-        elif mode == "COMPACTION":
-            # Compact dữ liệu của ngày hôm qua
-            yesterday = now_vn - timedelta(days=1)
-            start_date = yesterday.strftime("%Y-%m-%d")
-            end_date = start_date
-        
-        else:
-            raise ValueError(f"Unknown MODE: {mode}")
-        
-        return start_date, end_date
+        # Cố định trong suốt một run → cache theo mode
+        return _date_range_for_mode(Config.get_mode())
     
     @staticmethod
     def get_target_datetime():
@@ -4,9 +4,15 @@ config.py
 """
 import os
 from typing import Literal, List, Dict, Any
+import numpy as np
 
 class Config:
-    """Centralized configuration for Training Service"""
+    """
+    Centralized configuration for Training Service
+    
+    Collections là tuples (không dict/list mutable dùng chung): hashable,
+    không bị caller vô tình mutate; dict configs được trả về dạng copy.
+    """
     
     # ============ MODE CONFIGURATION ============
     MODE: Literal["FULL_TRAIN", "INCREMENTAL", "PREDICT"] = os.getenv(
@@ -27,6 +33,11 @@ class Config:
     # Data paths - ĐỌC TỪ GOLD CANONICAL (đã có features)
     GOLD_CANONICAL_PREFIX = "gold/canonical"  # Output từ Processing service
     MODELS_PREFIX = "models"
+    # S3 Transfer Acceleration cho model upload/download (bucket phải bật)
+    S3_USE_ACCELERATE = os.getenv("S3_USE_ACCELERATE", "false").lower() == "true"
+    # Disk cache cho model artifacts theo ETag (opt-in, rỗng → tắt).
+    # Không tự evict: mỗi ETag cũ của "latest" để lại một file trong thư mục
+    MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "")
     # PREDICTIONS_PREFIX = "predictions"
     
     # ============ MODEL CONFIGURATION ============
@@ -38,14 +49,14 @@ class Config:
     TARGET_COLUMN = "electricity_demand" # Hoặc "total_load"
     
     # Columns to exclude (metadata, không phải features)
-    EXCLUDE_FEATURES = [
+    EXCLUDE_FEATURES = (
         'datetime',           # Timestamp
         'query_date',         # Processing metadata
         'source',             # Data source
         'processed_at',       # Processing timestamp
         'signal',             # Signal column
         TARGET_COLUMN         # Target không phải feature
-    ]
+    )
     
     # ============ FEATURE ENGINEERING STRATEGY ============
     # Strategy: "xgboost", "lstm", "prophet"
@@ -54,12 +65,30 @@ class Config:
     # XGBoost-specific features (nếu cần thêm features từ Canonical)
     XGBOOST_FEATURE_CONFIG = {
         'create_lags': True,
-        'lag_periods': [1, 2, 3, 24, 168],  # 1h, 2h, 3h, 1day, 1week
+        'lag_periods': (1, 2, 3, 24, 168),  # 1h, 2h, 3h, 1day, 1week
         'create_rolling': True,
-        'rolling_windows': [3, 6, 12, 24],  # 3h, 6h, 12h, 24h
-        'create_interactions': False  # Tương tác giữa features
+        'rolling_windows': (3, 6, 12, 24),  # 3h, 6h, 12h, 24h
+        'create_interactions': False,  # Tương tác giữa features
+        'create_holidays': False  # is_holiday từ VIETNAM_HOLIDAYS (opt-in: đổi feature set)
     }
     
+    # ============ CALENDAR ============
+    # Ngày lễ dương lịch cố định của Việt Nam ("MM-DD"). Lễ âm lịch (Tết,
+    # Giỗ Tổ Hùng Vương) đổi ngày mỗi năm → không encode được bằng MM-DD
+    VIETNAM_HOLIDAYS = (
+        '01-01',  # Tết Dương lịch
+        '04-30',  # Ngày Giải phóng miền Nam
+        '05-01',  # Quốc tế Lao động
+        '09-02',  # Quốc khánh
+    )
+    
+    # Encode MMDD thành int (vd '04-30' → 430) → so khớp bằng phép tính
+    # integer vectorized thay vì strftime('%m-%d') từng row
+    HOLIDAY_MMDD_INT = np.fromiter(
+        (int(m) * 100 + int(d) for m, d in (h.split('-') for h in VIETNAM_HOLIDAYS)),
+        dtype=np.int16
+    )
+    
     # ============ DATA SPLIT ============
     TRAIN_RATIO = 0.7
     VAL_RATIO = 0.15
@@ -68,11 +97,11 @@ class Config:
     
     # ============ MODEL PIPELINE CONFIGURATION ============
     # Sklearn Pipeline steps
-    PIPELINE_STEPS = [
-        'scaler',      # StandardScaler
+    # Không có scaler: XGBoost hist tự quantize, trees bất biến với scaling
+    PIPELINE_STEPS = (
         'selector',    # Feature selection (optional)
         'model'        # XGBRegressor
-    ]
+    )
     
     # ============ XGBOOST HYPERPARAMETERS ============
     XGBOOST_PARAMS = {
@@ -88,7 +117,10 @@ class Config:
         'reg_lambda': 1,
         'random_state': RANDOM_STATE,
         'n_jobs': -1,
-        'verbosity': 1
+        'verbosity': 1,
+        # Histogram tree method; set XGB_DEVICE=cuda để train/predict trên GPU
+        'tree_method': os.getenv("XGB_TREE_METHOD", "hist"),
+        'device': os.getenv("XGB_DEVICE", "cpu")
     }
     
     # Early stopping
@@ -96,7 +128,7 @@ class Config:
     
     # ============ EVALUATION ============
     CV_FOLDS = 5
-    METRICS = ['rmse', 'mape', 'mae', 'r2', 'forecast_bias']
+    METRICS = ('rmse', 'mape', 'mae', 'r2', 'forecast_bias')
     CONFIDENCE_LEVEL = 0.95
     
     # ============ PREDICTION ============
@@ -115,21 +147,38 @@ class Config:
     # ============ PERFORMANCE ============
     MAX_MEMORY_GB = 4
     BATCH_SIZE = 10000
-
+    
+    # validate() chỉ chạy checks một lần mỗi process
+    _VALIDATED = False
     
     @staticmethod
     def get_feature_config() -> Dict[str, Any]:
         """Get feature engineering config cho strategy hiện tại"""
         if Config.FEATURE_STRATEGY == "xgboost":
-            return Config.XGBOOST_FEATURE_CONFIG
+            return dict(Config.XGBOOST_FEATURE_CONFIG)
         else:
             return {}
     
+    @staticmethod
+    def is_holiday_vectorized(dt_index) -> np.ndarray:
+        """
+        Mask ngày lễ cho một DatetimeIndex (hoặc datetime Series)
+        
+        Args:
+            dt_index: pd.DatetimeIndex / pd.Series datetime64
+        
+        Returns:
+            np.ndarray: bool mask, True nếu là ngày lễ
+        """
+        dt = getattr(dt_index, 'dt', dt_index)
+        mmdd = np.asarray(dt.month, dtype=np.int16) * 100 + np.asarray(dt.day, dtype=np.int16)
+        return np.isin(mmdd, Config.HOLIDAY_MMDD_INT)
+    
     @staticmethod
     def get_model_params() -> Dict[str, Any]:
         """Get hyperparameters cho model type"""
         if Config.MODEL_TYPE == "xgboost":
-            return Config.XGBOOST_PARAMS
+            return dict(Config.XGBOOST_PARAMS)
         else:
             raise ValueError(f"Unknown model type: {Config.MODEL_TYPE}")
     
@@ -143,6 +192,9 @@ class Config:
     @staticmethod
     def validate():
         """Validate configuration"""
+        if Config._VALIDATED:
+            return True
+        
         errors = []
         
         if not Config.S3_BUCKET:
@@ -159,6 +211,7 @@ class Config:
         if errors:
             raise ValueError("\n".join(errors))
         
+        Config._VALIDATED = True
         return True
     
     @staticmethod
@@ -180,8 +233,8 @@ Data:
   • Split: {Config.TRAIN_RATIO}/{Config.VAL_RATIO}/{Config.TEST_RATIO}
 
 Feature Engineering:
-  • Lags: {Config.XGBOOST_FEATURE_CONFIG.get('lag_periods', [])}
-  • Rolling: {Config.XGBOOST_FEATURE_CONFIG.get('rolling_windows', [])}
+  • Lags: {list(Config.XGBOOST_FEATURE_CONFIG.get('lag_periods', ()))}
+  • Rolling: {list(Config.XGBOOST_FEATURE_CONFIG.get('rolling_windows', ()))}
 
 Model Pipeline:
   • Steps: {' → '.join(Config.PIPELINE_STEPS)}
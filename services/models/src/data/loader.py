@@ -6,7 +6,7 @@ import logging
 import pandas as pd
 import boto3
 import io
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Sequence
 
 logger = logging.getLogger(__name__)
 
@@ -79,7 +79,7 @@ class DataLoader:
         
         # Sort by datetime
         if 'datetime' in combined_df.columns:
-            combined_df = combined_df.sort_values('datetime').reset_index(drop=True)
+            combined_df = combined_df.sort_values('datetime', ignore_index=True)
         
         logger.info(f"✅ Loaded {len(combined_df)} total rows")
         logger.info(f"  Columns: {len(combined_df.columns)}")
@@ -96,7 +96,7 @@ class DataLoader:
         self,
         df: pd.DataFrame,
         target_column: str,
-        exclude_features: list = None
+        exclude_features: Optional[Sequence[str]] = None
     ) -> Tuple[pd.DataFrame, pd.Series, pd.DatetimeIndex]:
         """
         Prepare X, y, timestamps từ canonical data
@@ -131,7 +131,7 @@ class DataLoader:
             timestamps = pd.DatetimeIndex(range(len(df)))
         
         # Exclude features
-        exclude = exclude_features or []
+        exclude = frozenset(exclude_features or ())
         feature_cols = [col for col in df.columns if col not in exclude]
         
         X = df[feature_cols].copy()
@@ -265,7 +265,7 @@ class DataLoader:
         if 'datetime' in combined.columns:
             combined['datetime'] = pd.to_datetime(combined['datetime'])
             combined = combined.drop_duplicates(subset=['datetime'])
-            combined = combined.sort_values('datetime').reset_index(drop=True)
+            combined = combined.sort_values('datetime', ignore_index=True)
         
         # Filter to exact time range
         combined = combined[
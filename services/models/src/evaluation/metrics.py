@@ -14,9 +14,27 @@ def calculate_rmse(y_true: np.ndarray, y_pred: np.ndarray) -> float:
     """Root Mean Square Error"""
     return np.sqrt(mean_squared_error(y_true, y_pred))
 
-def calculate_mape(y_true: np.ndarray, y_pred: np.ndarray) -> float:
-    """Mean Absolute Percentage Error"""
-    return np.mean(np.abs((y_true - y_pred) / y_true)) * 100
+def calculate_mape(
+    y_true: np.ndarray,
+    y_pred: np.ndarray,
+    eps: float = 1e-8
+) -> float:
+    """
+    Mean Absolute Percentage Error
+    
+    Mẫu số được clip bằng max(|y_true|, eps) → không inf/nan khi y_true == 0.
+    Tính in-place trên 2 buffers, không tạo array tạm mỗi phép.
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    
+    denom = np.abs(y_true)
+    np.maximum(denom, eps, out=denom)
+    
+    num = np.subtract(y_true, y_pred)
+    np.abs(num, out=num)
+    np.divide(num, denom, out=num)
+    
+    return num.mean() * 100
 
 def calculate_mae(y_true: np.ndarray, y_pred: np.ndarray) -> float:
     """Mean Absolute Error"""
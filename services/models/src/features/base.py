@@ -23,12 +23,13 @@ class BaseFeatureStrategy(ABC):
         self.feature_names = []
     
     @abstractmethod
-    def create_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def create_features(self, df: pd.DataFrame, in_place: bool = False) -> pd.DataFrame:
         """
         Tạo features từ canonical data
         
         Args:
             df: Input canonical DataFrame (đã có base features)
+            in_place: Cho phép mutate df thay vì copy (caller không dùng df nữa)
         
         Returns:
             pd.DataFrame: DataFrame với additional features
@@ -4,6 +4,6 @@
 """
 Feature Engineering Strategies
 """
-from .xgboost import XGBoostFeatureStrategy
+from .xgboost import XGBoostFeatureStrategy, make_lag_matrix
 
-__all__ = ['XGBoostFeatureStrategy']
\ No newline at end of file
+__all__ = ['XGBoostFeatureStrategy', 'make_lag_matrix']
\ No newline at end of file
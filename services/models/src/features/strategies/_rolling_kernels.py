@@ -0,0 +1,112 @@
+"""
+features/strategies/_rolling_kernels.py
+⚡ Fused rolling mean + std kernels (Numba nếu có, fallback NumPy cumsum)
+"""
+import math
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+if njit is not None:
+    # Mỗi (column, window): một sweep với running sum / sum-of-squares,
+    # mean và std ghi cùng lúc (không rolling().mean() + rolling().std())
+    @njit(cache=True, parallel=True)
+    def _rolling_kernel(values, windows, out):
+        n_rows, n_cols = values.shape
+        for c in prange(n_cols):
+            for k in range(windows.shape[0]):
+                w = windows[k]
+                s = 0.0
+                s2 = 0.0
+                n_nan = 0
+                for i in range(n_rows):
+                    x = values[i, c]
+                    if math.isnan(x):
+                        n_nan += 1
+                    else:
+                        s += x
+                        s2 += x * x
+                    if i >= w:
+                        y = values[i - w, c]
+                        if math.isnan(y):
+                            n_nan -= 1
+                        else:
+                            s -= y
+                            s2 -= y * y
+                    if i >= w - 1 and n_nan == 0:
+                        out[i, c, k, 0] = s / w
+                        if w == 1:
+                            out[i, c, k, 1] = math.nan
+                        else:
+                            var = (s2 - s * s / w) / (w - 1)
+                            out[i, c, k, 1] = math.sqrt(var) if var > 0.0 else 0.0
+                    else:
+                        out[i, c, k, 0] = math.nan
+                        out[i, c, k, 1] = math.nan
+
+else:
+    def _rolling_kernel(values, windows, out):
+        # Prefix sums một lần cho mọi windows: sum cửa sổ = hiệu 2 prefix
+        n_rows = values.shape[0]
+        nan_mask = np.isnan(values)
+        filled = np.where(nan_mask, 0.0, values)
+
+        zeros = np.zeros((1, values.shape[1]))
+        cs = np.concatenate((zeros, np.cumsum(filled, axis=0)))
+        cs2 = np.concatenate((zeros, np.cumsum(filled * filled, axis=0)))
+        cnt = np.concatenate((zeros, np.cumsum(nan_mask, axis=0)))
+
+        out.fill(np.nan)
+        for k, w in enumerate(windows):
+            w = int(w)
+            if w > n_rows:
+                continue
+            s = cs[w:] - cs[:-w]
+            s2 = cs2[w:] - cs2[:-w]
+            valid = (cnt[w:] - cnt[:-w]) == 0
+
+            mean = s / w
+            with np.errstate(invalid='ignore', divide='ignore'):
+                var = (s2 - s * s / w) / (w - 1) if w > 1 else np.full_like(s, np.nan)
+            std = np.sqrt(np.maximum(var, 0.0))
+
+            out[w - 1:, :, k, 0] = np.where(valid, mean, np.nan)
+            out[w - 1:, :, k, 1] = np.where(valid, std, np.nan)
+
+def rolling_mean_std(
+    values: np.ndarray,
+    windows: np.ndarray,
+    dtype: np.dtype = np.float64
+) -> np.ndarray:
+    """
+    Rolling mean + std (ddof=1) cho mọi (column, window) trong một lần gọi
+
+    Cùng semantics với Series.rolling(w).mean() / .std(): w-1 rows đầu NaN,
+    cửa sổ chứa NaN → NaN. Data được center theo mean của column trước khi
+    tích lũy (giữ độ chính xác của sum-of-squares với load ~1e4 MW).
+
+    Args:
+        values: 2-D array (N, C)
+        windows: Window sizes (int, > 0)
+        dtype: Float dtype của output (accumulators luôn float64)
+
+    Returns:
+        np.ndarray: (N, C, len(windows), 2); [..., 0] = mean,
+                    [..., 1] = std
+    """
+    values = np.asarray(values, dtype=np.float64)
+    windows = np.asarray(windows, dtype=np.int64)
+
+    with np.errstate(invalid='ignore'):
+        has_value = ~np.isnan(values).all(axis=0)
+        center = np.zeros(values.shape[1])
+        center[has_value] = np.nanmean(values[:, has_value], axis=0)
+
+    out = np.empty((values.shape[0], values.shape[1], len(windows), 2), dtype=dtype)
+    _rolling_kernel(np.ascontiguousarray(values - center), windows, out)
+
+    out[..., 0] += center[:, None]
+    return out
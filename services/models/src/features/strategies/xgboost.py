@@ -6,10 +6,55 @@ import logging
 import pandas as pd
 import numpy as np
 from typing import Dict, Any, List
+from config import Config
 from ..base import BaseFeatureStrategy
+from ._rolling_kernels import rolling_mean_std
 
 logger = logging.getLogger(__name__)
 
+# Cyclical encoding của hour: chỉ 24 giá trị → lookup table thay cho
+# sin/cos trên N rows
+_HOUR_ANGLES = 2 * np.pi * np.arange(24) / 24
+_HOUR_SIN = np.sin(_HOUR_ANGLES).astype(np.float32)
+_HOUR_COS = np.cos(_HOUR_ANGLES).astype(np.float32)
+
+# is_weekend theo day_of_week (0=Mon..6=Sun): gather thay cho isin
+_WEEKEND_LUT = np.array([0, 0, 0, 0, 0, 1, 1], dtype=np.int8)
+
+def make_lag_matrix(
+    values: np.ndarray,
+    lags: np.ndarray,
+    dtype: np.dtype = np.float64
+) -> np.ndarray:
+    """
+    Tất cả lags của một hoặc nhiều columns trong một buffer (không shift
+    từng column / từng lag)
+    
+    Output được cấp phát một lần; mỗi lag là một slice copy của cả block
+    (N, C) vào vị trí của nó, phần đầu (lag rows) là NaN.
+    
+    Args:
+        values: 1-D (N,) hoặc 2-D (N, C) array
+        lags: Lag periods (int, > 0)
+        dtype: Float dtype của output
+    
+    Returns:
+        np.ndarray: (N, C * len(lags)); cột c * len(lags) + j =
+                    column c shift lags[j] (1-D input → (N, len(lags)))
+    """
+    values = np.asarray(values, dtype=dtype)
+    if values.ndim == 1:
+        values = values[:, None]
+    n_rows, n_cols = values.shape
+    
+    out = np.empty((n_rows, n_cols, len(lags)), dtype=dtype)
+    for j, lag in enumerate(lags):
+        lag = min(int(lag), n_rows)
+        out[:lag, :, j] = np.nan
+        out[lag:, :, j] = values[:n_rows - lag]
+    
+    return out.reshape(n_rows, n_cols * len(lags))
+
 class XGBoostFeatureStrategy(BaseFeatureStrategy):
     """
     Feature engineering strategy cho XGBoost
@@ -26,21 +71,27 @@ class XGBoostFeatureStrategy(BaseFeatureStrategy):
         # Config defaults
         self.create_lags = config.get('create_lags', True)
         self.lag_periods = config.get('lag_periods', [1, 2, 3, 24, 168])
+        self._lag_arr = np.asarray(self.lag_periods, dtype=np.int32)
         
         self.create_rolling = config.get('create_rolling', True)
         self.rolling_windows = config.get('rolling_windows', [3, 6, 12, 24])
+        self._window_arr = np.asarray(self.rolling_windows, dtype=np.int64)
         
         self.create_interactions = config.get('create_interactions', False)
         
+        # is_holiday theo Config.VIETNAM_HOLIDAYS
+        self.create_holidays = config.get('create_holidays', False)
+        
         self.target_column = None
         self.created_features = []
     
-    def create_features(self, df: pd.DataFrame) -> pd.DataFrame:
+    def create_features(self, df: pd.DataFrame, in_place: bool = False) -> pd.DataFrame:
         """
         Tạo XGBoost features từ canonical data
         
         Args:
             df: Canonical DataFrame (đã có base features từ Processing)
+            in_place: Thêm features trực tiếp vào df (không copy toàn bộ frame)
         
         Returns:
             pd.DataFrame: DataFrame với lag và rolling features
@@ -49,8 +100,14 @@ class XGBoostFeatureStrategy(BaseFeatureStrategy):
         
         self.validate_input(df)
         
-        df_features = df.copy()
+        df_features = df if in_place else df.copy()
         self.created_features = []
+        
+        # float32 end-to-end: XGBoost dùng float32 nội bộ, nửa bytes cho
+        # lag/rolling (Gold canonical thường đã float32 → no-op)
+        float64_cols = df_features.select_dtypes(include=[np.float64]).columns
+        if len(float64_cols):
+            df_features[float64_cols] = df_features[float64_cols].astype(np.float32)
 
         # === ADD THIS SECTION ===
         # 0. TIME-BASED FEATURES (extract from datetime)
@@ -79,9 +136,15 @@ class XGBoostFeatureStrategy(BaseFeatureStrategy):
         if self.create_interactions:
             df_features = self._create_interaction_features(df_features)
         
-        # Drop rows with NaN created by lag/rolling
+        # Drop rows with NaN created by lag/rolling: cắt prefix NaN đã biết
+        # trước, rồi kiểm tra NaN trên toàn bộ block còn lại (mọi columns,
+        # kể cả non-numeric / excluded / interactions) → còn NaN thì dropna
         initial_len = len(df_features)
-        df_features = df_features.dropna()
+        prefix_len = self._nan_prefix_len() if numeric_cols else None
+        if prefix_len is not None:
+            df_features = df_features.iloc[prefix_len:]
+        if prefix_len is None or df_features.isna().to_numpy().any():
+            df_features = df_features.dropna()
         dropped = initial_len - len(df_features)
         
         if dropped > 0:
@@ -94,6 +157,22 @@ class XGBoostFeatureStrategy(BaseFeatureStrategy):
         
         return df_features
     
+    def _nan_prefix_len(self):
+        """
+        Số rows đầu chứa NaN do lag/rolling (None nếu không xác định được)
+        
+        lag L → L rows đầu NaN; rolling window w → w-1 rows đầu NaN
+        (window < 2 → std NaN toàn cột → cần dropna)
+        """
+        prefix_len = 0
+        if self.create_lags and len(self._lag_arr):
+            prefix_len = max(prefix_len, int(self._lag_arr.max()))
+        if self.create_rolling and len(self.rolling_windows):
+            if min(self.rolling_windows) < 2:
+                return None
+            prefix_len = max(prefix_len, max(self.rolling_windows) - 1)
+        return prefix_len
+    
     def _create_lag_features(
         self,
         df: pd.DataFrame,
@@ -102,13 +181,20 @@ class XGBoostFeatureStrategy(BaseFeatureStrategy):
         """Tạo lag features"""
         logger.info(f"  Creating lag features (periods={self.lag_periods})...")
         
-        for col in columns:
-            for lag in self.lag_periods:
-                feature_name = f"{col}_lag_{lag}"
-                df[feature_name] = df[col].shift(lag)
-                self.created_features.append(feature_name)
+        if not columns or not len(self._lag_arr):
+            return df
         
-        logger.info(f"    ✅ Created {len(columns) * len(self.lag_periods)} lag features")
+        # Mọi (column, lag) trong một buffer 2-D; ghép một lần vào df
+        feature_names = [f"{col}_lag_{lag}" for col in columns for lag in self.lag_periods]
+        lag_matrix = make_lag_matrix(
+            df[columns].to_numpy(dtype=np.float32), self._lag_arr, dtype=np.float32
+        )
+        
+        lag_df = pd.DataFrame(lag_matrix, index=df.index, columns=feature_names)
+        df = pd.concat([df, lag_df], axis=1)
+        self.created_features.extend(feature_names)
+        
+        logger.info(f"    ✅ Created {len(feature_names)} lag features")
         
         return df
     
@@ -120,19 +206,30 @@ class XGBoostFeatureStrategy(BaseFeatureStrategy):
         """Tạo rolling statistics features"""
         logger.info(f"  Creating rolling features (windows={self.rolling_windows})...")
         
-        for col in columns:
-            for window in self.rolling_windows:
-                # Rolling mean
-                feature_name = f"{col}_rolling_mean_{window}"
-                df[feature_name] = df[col].rolling(window=window).mean()
-                self.created_features.append(feature_name)
-                
-                # Rolling std
-                feature_name = f"{col}_rolling_std_{window}"
-                df[feature_name] = df[col].rolling(window=window).std()
-                self.created_features.append(feature_name)
+        if not columns or not len(self._window_arr):
+            return df
+        
+        # Mean + std của mọi (column, window) trong một kernel (running
+        # sum / sum-of-squares); ghép một lần vào df
+        feature_names = [
+            f"{col}_rolling_{stat}_{window}"
+            for col in columns
+            for window in self.rolling_windows
+            for stat in ('mean', 'std')
+        ]
+        stats = rolling_mean_std(
+            df[columns].to_numpy(dtype=np.float64), self._window_arr, dtype=np.float32
+        )
+        
+        rolling_df = pd.DataFrame(
+            stats.reshape(len(df), len(feature_names)),
+            index=df.index,
+            columns=feature_names
+        )
+        df = pd.concat([df, rolling_df], axis=1)
+        self.created_features.extend(feature_names)
         
-        total = len(columns) * len(self.rolling_windows) * 2  # mean + std
+        total = len(feature_names)  # mean + std
         logger.info(f"    ✅ Created {total} rolling features")
         
         return df
@@ -175,7 +272,8 @@ class XGBoostFeatureStrategy(BaseFeatureStrategy):
             'config': {
                 'lag_periods': self.lag_periods,
                 'rolling_windows': self.rolling_windows,
-                'interactions_enabled': self.create_interactions
+                'interactions_enabled': self.create_interactions,
+                'holidays_enabled': self.create_holidays
             }
         }
 
@@ -194,24 +292,32 @@ class XGBoostFeatureStrategy(BaseFeatureStrategy):
     
         dt = pd.to_datetime(df['datetime'])
     
-        # Basic time features
-        df['hour'] = dt.dt.hour
-        df['day_of_week'] = dt.dt.dayofweek
-        df['day_of_month'] = dt.dt.day
-        df['month'] = dt.dt.month
+        # Basic time features (int8: mọi giá trị < 128)
+        df['hour'] = dt.dt.hour.astype(np.int8)
+        df['day_of_week'] = dt.dt.dayofweek.astype(np.int8)
+        df['day_of_month'] = dt.dt.day.astype(np.int8)
+        df['month'] = dt.dt.month.astype(np.int8)
     
         # Binary features
-        df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int)
+        df['is_weekend'] = _WEEKEND_LUT[df['day_of_week'].to_numpy()]
+        
+        # Holiday: so khớp MMDD integer (month * 100 + day), không strftime
+        if self.create_holidays:
+            df['is_holiday'] = Config.is_holiday_vectorized(dt).astype(np.int8)
     
-        # Cyclical encoding (sin/cos for hour to capture periodicity)
-        df['hour_sin'] = np.sin(2 * np.pi * df['hour'] / 24)
-        df['hour_cos'] = np.cos(2 * np.pi * df['hour'] / 24)
+        # Cyclical encoding (sin/cos for hour to capture periodicity): gather
+        # từ lookup table 24 phần tử
+        hour = df['hour'].to_numpy()
+        df['hour_sin'] = _HOUR_SIN[hour]
+        df['hour_cos'] = _HOUR_COS[hour]
     
         # Track created features
         time_features = [
             'hour', 'day_of_week', 'day_of_month', 'month',
             'is_weekend', 'hour_sin', 'hour_cos'
         ]
+        if 'is_holiday' in df.columns:
+            time_features.append('is_holiday')
         self.created_features.extend(time_features)
     
         logger.info(f"    ✅ Created {len(time_features)} time features")
@@ -109,7 +109,9 @@ def main():
             # Save to S3
             registry = ModelRegistry(
                 bucket_name=Config.S3_BUCKET,
-                models_prefix=Config.MODELS_PREFIX
+                models_prefix=Config.MODELS_PREFIX,
+                use_accelerate=Config.S3_USE_ACCELERATE,
+                cache_dir=Config.MODEL_CACHE_DIR
             )
             
             model_uri = registry.save_model(
@@ -168,7 +170,9 @@ def main():
     
             registry = ModelRegistry(
                 bucket_name=Config.S3_BUCKET,
-                models_prefix=Config.MODELS_PREFIX
+                models_prefix=Config.MODELS_PREFIX,
+                use_accelerate=Config.S3_USE_ACCELERATE,
+                cache_dir=Config.MODEL_CACHE_DIR
             )
     
             predictor = ModelPredictor(config=Config)
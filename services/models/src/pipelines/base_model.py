@@ -6,12 +6,12 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, Tuple, Optional
 import numpy as np
 import pandas as pd
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ModelMetadata:
-    """Metadata cho model"""
+    """Metadata cho model (immutable, to_dict được cache)"""
     model_type: str
     version: str
     trained_at: str
@@ -19,13 +19,19 @@ class ModelMetadata:
     validation_samples: int
     test_samples: int
     features_count: int
-    feature_names: list
+    feature_names: tuple
     hyperparameters: dict
+    _dict_cache: dict = field(default=None, init=False, repr=False, compare=False)
     
     def to_dict(self) -> dict:
-        return asdict(self)
+        # asdict deep-copy chỉ chạy một lần; trả về shallow copy của cache
+        if self._dict_cache is None:
+            data = asdict(self)
+            data.pop('_dict_cache')
+            object.__setattr__(self, '_dict_cache', data)
+        return dict(self._dict_cache)
 
-@dataclass
+@dataclass(slots=True)
 class PredictionOutput:
     """Standardized output format cho tất cả models"""
     predictions: np.ndarray          # Shape: (n_samples,)
@@ -39,7 +45,10 @@ class PredictionOutput:
         """Convert to dict for JSON serialization"""
         return {
             'predictions': self.predictions.tolist(),
-            'timestamps': [str(ts) for ts in self.timestamps],
+            # Format toàn bộ array trong C thay vì str() từng phần tử
+            'timestamps': np.datetime_as_string(
+                np.asarray(self.timestamps, dtype='datetime64[ns]'), unit='s'
+            ).tolist(),
             'confidence_intervals': {
                 'lower': self.confidence_lower.tolist(),
                 'upper': self.confidence_upper.tolist()
@@ -56,6 +65,12 @@ class BaseModel(ABC):
     để đảm bảo tính nhất quán trong pipeline
     """
     
+    __slots__ = (
+        'model_type', 'hyperparameters', 'model', 'scaler', 'feature_names',
+        'is_trained', 'metadata',
+        '_feature_set', '_feature_set_src', '_validated_columns'
+    )
+    
     def __init__(self, model_type: str, hyperparameters: dict = None):
         """
         Args:
@@ -69,6 +84,11 @@ class BaseModel(ABC):
         self.feature_names = None
         self.is_trained = False
         self.metadata = None
+        
+        # Validation cache: frozenset(feature_names) + columns object đã validate
+        self._feature_set = None
+        self._feature_set_src = None
+        self._validated_columns = None
     
     @abstractmethod
     def train(
@@ -121,10 +141,30 @@ class BaseModel(ABC):
         """
         pass
     
+    @abstractmethod
+    def _calculate_confidence_intervals(
+        self,
+        predictions: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Confidence intervals cho toàn bộ batch predictions
+        
+        Dùng chung bởi predict và _predict_chunked (intervals tính trên cả
+        batch, không theo chunk).
+        
+        Args:
+            predictions: Point predictions
+        
+        Returns:
+            Tuple: (lower_bounds, upper_bounds)
+        """
+        pass
+    
     def predict_with_metadata(
         self,
         X: pd.DataFrame,
-        timestamps: pd.Series = None
+        timestamps: pd.Series = None,
+        chunk_size: int = None
     ) -> PredictionOutput:
         """
         Predict và trả về standardized output
@@ -132,6 +172,9 @@ class BaseModel(ABC):
         Args:
             X: Features DataFrame
             timestamps: Timestamps tương ứng với predictions
+            chunk_size: Nếu set và model có predict_stream, point predictions
+                theo chunk vào array cấp phát trước (bound peak memory);
+                confidence intervals vẫn tính trên toàn bộ predictions
         
         Returns:
             PredictionOutput: Standardized output
@@ -140,10 +183,13 @@ class BaseModel(ABC):
             raise ValueError("Model chưa được train!")
         
         # Generate predictions
-        predictions, (conf_lower, conf_upper) = self.predict(
-            X,
-            return_confidence=True
-        )
+        if chunk_size is not None and hasattr(self, 'predict_stream'):
+            predictions, conf_lower, conf_upper = self._predict_chunked(X, chunk_size)
+        else:
+            predictions, (conf_lower, conf_upper) = self.predict(
+                X,
+                return_confidence=True
+            )
         
         # Handle timestamps
         if timestamps is None:
@@ -172,6 +218,37 @@ class BaseModel(ABC):
         
         return output
     
+    def _predict_chunked(
+        self,
+        X: pd.DataFrame,
+        chunk_size: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Consume predict_stream vào array cấp phát trước
+        
+        Chỉ point predictions đi theo chunk. Confidence intervals tính một
+        lần trên toàn bộ predictions (_calculate_confidence_intervals của
+        model, như predict) → không phụ thuộc chunk_size.
+        
+        Args:
+            X: Features DataFrame
+            chunk_size: Số rows mỗi chunk
+        
+        Returns:
+            Tuple: (predictions, confidence_lower, confidence_upper)
+        """
+        predictions = np.empty(len(X), dtype=np.float32)
+        
+        start = 0
+        for preds in self.predict_stream(X, chunk_size=chunk_size):
+            end = start + len(preds)
+            predictions[start:end] = preds
+            start = end
+        
+        conf_lower, conf_upper = self._calculate_confidence_intervals(predictions)
+        
+        return predictions, conf_lower, conf_upper
+    
     def save_metadata(
         self,
         version: str,
@@ -198,7 +275,7 @@ class BaseModel(ABC):
             validation_samples=val_size,
             test_samples=test_size,
             features_count=len(feature_names),
-            feature_names=feature_names,
+            feature_names=tuple(feature_names),
             hyperparameters=self.hyperparameters
         )
     
@@ -216,14 +293,27 @@ class BaseModel(ABC):
             raise ValueError("Input DataFrame is empty")
         
         if self.feature_names is not None:
-            missing_features = set(self.feature_names) - set(X.columns)
+            # Rebuild frozenset chỉ khi feature_names thay đổi (sau train)
+            if self.feature_names is not self._feature_set_src:
+                self._feature_set = frozenset(self.feature_names)
+                self._feature_set_src = self.feature_names
+                self._validated_columns = None
+            
+            # Columns object được share giữa các slice → bỏ qua validate lại
+            columns = X.columns
+            if columns is self._validated_columns:
+                return
+            
+            missing_features = self._feature_set.difference(columns)
             if missing_features:
                 raise ValueError(f"Missing features: {missing_features}")
             
-            extra_features = set(X.columns) - set(self.feature_names)
+            extra_features = set(columns).difference(self._feature_set)
             if extra_features:
                 # Just log warning, không raise error
                 print(f"⚠️ Extra features will be ignored: {extra_features}")
+            
+            self._validated_columns = columns
     
     def __repr__(self) -> str:
         status = "Trained" if self.is_trained else "Not Trained"
@@ -3,6 +3,7 @@ pipelines/factory.py
 🏭 Model Pipeline Factory
 """
 import logging
+import sys
 from typing import Dict, Any
 from .wrappers.xgboost_pkg import XGBoostModelWrapper
 
@@ -19,6 +20,8 @@ class ModelPipelineFactory:
         # 'lstm': LSTMModelWrapper,
         # 'random_forest': RandomForestModelWrapper,
     }
+    # Keys lowercase + interned → lookup so sánh theo identity
+    _pipelines = {sys.intern(k.lower()): v for k, v in _pipelines.items()}
     
     @classmethod
     def create_pipeline(
@@ -39,18 +42,17 @@ class ModelPipelineFactory:
         Raises:
             ValueError: If model type not supported
         """
-        model_type = model_type.lower()
+        model_type = sys.intern(model_type.lower())
+        pipeline_class = cls._pipelines.get(model_type)
         
-        if model_type not in cls._pipelines:
-            available = ', '.join(cls._pipelines.keys())
+        if pipeline_class is None:
+            available = ', '.join(cls._pipelines)
             raise ValueError(
                 f"Unknown model type: {model_type}. "
                 f"Available: {available}"
             )
         
-        pipeline_class = cls._pipelines[model_type]
-        
-        logger.info(f"🏭 Creating {model_type} pipeline...")
+        logger.info("🏭 Creating %s pipeline...", model_type)
         pipeline = pipeline_class(hyperparameters=hyperparameters)
         
         return pipeline
@@ -58,7 +60,7 @@ class ModelPipelineFactory:
     @classmethod
     def register_pipeline(cls, name: str, pipeline_class: type):
         """Register new pipeline"""
-        cls._pipelines[name] = pipeline_class
+        cls._pipelines[sys.intern(name.lower())] = pipeline_class
         logger.info(f"✅ Registered pipeline: {name}")
     
     @classmethod
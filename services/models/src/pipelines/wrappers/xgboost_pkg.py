@@ -5,12 +5,13 @@ pipelines/wrappers/xgboost_pkg.py
 import logging
 import numpy as np
 import pandas as pd
-from typing import Dict, Tuple, Optional, Any
+from typing import Dict, Tuple, Optional, Any, Iterator, Union
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
 from sklearn.feature_selection import SelectFromModel
 from xgboost import XGBRegressor
 
+from evaluation.metrics import calculate_mape
+
 
 logger = logging.getLogger(__name__)
 
@@ -19,9 +20,11 @@ class XGBoostModelWrapper:
     Wrapper cho XGBoost sử dụng sklearn Pipeline
     
     Pipeline:
-    1. StandardScaler - Chuẩn hóa features
-    2. SelectFromModel - Feature selection (optional)
-    3. XGBRegressor - Main model
+    1. SelectFromModel - Feature selection (optional)
+    2. XGBRegressor - Main model
+    
+    Không có scaler: trees bất biến với monotone transforms, và
+    tree_method='hist' tự quantize features (QuantileDMatrix).
     """
     
     def __init__(self, hyperparameters: Dict[str, Any] = None):
@@ -29,16 +32,45 @@ class XGBoostModelWrapper:
         Args:
             hyperparameters: XGBoost hyperparameters
         """
-        self.hyperparameters = hyperparameters or {}
+        # Copy: không bao giờ mutate dict của caller (vd Config.XGBOOST_PARAMS)
+        self.hyperparameters = dict(hyperparameters or {})
+        
+        # XGBRegressor params build một lần. early_stopping_rounds chỉ có
+        # nghĩa khi có validation set → bản không early stopping tách riêng
+        # eval_metric mặc định: mape + rmse (rmse cuối → dùng cho early stopping)
+        self._params = {'eval_metric': ['mape', 'rmse'], **self.hyperparameters}
+        self._params_no_es = {
+            k: v for k, v in self._params.items() if k != 'early_stopping_rounds'
+        }
+        
         self.pipeline = None
         self.feature_names = None
         self.is_fitted = False
         self.feature_importance_ = None
+        
+        # Cached column positions của feature_names trong input X
+        self._col_idx = None
+        self._columns_key = None
+        self._columns_ref = None
+        
+        # Compiled predictor (treelite / tl2cgen), opt-in
+        self._fast_predictor = None
+        self._fast_dmatrix = None
     
-    def build_pipeline(self) -> Pipeline:
+    def __setstate__(self, state: Dict[str, Any]):
+        """Artifacts cũ thiếu các cache attributes → default None khi unpickle"""
+        self.__dict__.update(state)
+        for attr in ('_col_idx', '_columns_key', '_columns_ref',
+                     '_fast_predictor', '_fast_dmatrix'):
+            self.__dict__.setdefault(attr, None)
+    
+    def build_pipeline(self, early_stopping: bool = True) -> Pipeline:
         """
         Build sklearn Pipeline
         
+        Args:
+            early_stopping: Giữ early_stopping_rounds (cần validation set)
+        
         Returns:
             Pipeline: Configured pipeline
         """
@@ -46,16 +78,14 @@ class XGBoostModelWrapper:
         
         steps = []
         
-        # Step 1: Scaler
-        steps.append(('scaler', StandardScaler()))
-        
-        # Step 2: Feature selector (optional)
+        # Step 1: Feature selector (optional)
         # Uncomment để enable feature selection
         # estimator = xgb.XGBRegressor(n_estimators=10, random_state=42)
         # steps.append(('selector', SelectFromModel(estimator, threshold='median')))
         
-        # Step 3: XGBoost model
-        xgb_model = XGBRegressor(**self.hyperparameters)
+        # Step 2: XGBoost model
+        params = self._params if early_stopping else self._params_no_es
+        xgb_model = XGBRegressor(**params)
         steps.append(('model', xgb_model))
         
         pipeline = Pipeline(steps)
@@ -69,7 +99,8 @@ class XGBoostModelWrapper:
         X_train: pd.DataFrame,
         y_train: pd.Series,
         X_val: pd.DataFrame = None,
-        y_val: pd.Series = None
+        y_val: pd.Series = None,
+        xgb_model=None
     ) -> Dict[str, float]:
         """
         Fit pipeline on training data
@@ -79,6 +110,7 @@ class XGBoostModelWrapper:
             y_train: Training target
             X_val: Validation features (for early stopping)
             y_val: Validation target
+            xgb_model: Booster để warm-start (trees mới được thêm tiếp vào)
         
         Returns:
             Dict: Training metrics
@@ -88,29 +120,42 @@ class XGBoostModelWrapper:
         
         # Store feature names
         self.feature_names = X_train.columns.tolist()
+        self._col_idx = None
+        self._fast_predictor = None
         
-        # Build pipeline
-        self.pipeline = self.build_pipeline()
+        has_val = X_val is not None and y_val is not None
         
-        # Prepare eval set for early stopping
-        fit_params = {}
-        if X_val is not None and y_val is not None:
-            logger.info(f"  Val samples: {len(X_val)}")
-            
-            # Transform validation data using scaler
-            X_val_scaled = self.pipeline.named_steps['scaler'].transform(X_val)
-            
-            fit_params['model__eval_set'] = [(X_val_scaled, y_val)]
-            fit_params['model__verbose'] = False
+        # Build pipeline (early stopping chỉ khi có validation set,
+        # nếu không XGBoost sẽ early-stop trên chính train set)
+        self.pipeline = self.build_pipeline(early_stopping=has_val)
+        estimator = self.pipeline.named_steps['model']
+        
+        # Fit model với eval_set = [train, val] trên float32 arrays
+        # → train/val metrics lấy từ evals_result_, không cần predict lại
+        X_train_arr = X_train.to_numpy(dtype=np.float32)
+        eval_set = [(X_train_arr, y_train)]
         
-        # Fit pipeline
-        self.pipeline.fit(X_train, y_train, **fit_params)
+        if has_val:
+            logger.info(f"  Val samples: {len(X_val)}")
+            X_val_arr = self._select_features(X_val)
+            eval_set.append((X_val_arr, y_val))
+        
+        # Fit model
+        estimator.fit(
+            X_train_arr, y_train,
+            eval_set=eval_set,
+            verbose=False,
+            xgb_model=xgb_model
+        )
         
         self.is_fitted = True
         
         # Calculate training metrics
-        y_train_pred = self.pipeline.predict(X_train)
-        train_rmse = np.sqrt(np.mean((y_train - y_train_pred) ** 2))
+        evals_result = estimator.evals_result()
+        train_rmse = self._final_eval_metric(evals_result, 'validation_0', 'rmse')
+        if train_rmse is None:
+            y_train_pred = self._predict_array(X_train_arr)
+            train_rmse = np.sqrt(np.mean((y_train - y_train_pred) ** 2))
         
         metrics = {
             'train_rmse': train_rmse,
@@ -118,10 +163,17 @@ class XGBoostModelWrapper:
         }
         
         # Validation metrics
-        if X_val is not None:
-            y_val_pred = self.pipeline.predict(X_val)
-            val_rmse = np.sqrt(np.mean((y_val - y_val_pred) ** 2))
-            val_mape = np.mean(np.abs((y_val - y_val_pred) / y_val)) * 100
+        if has_val:
+            val_rmse = self._final_eval_metric(evals_result, 'validation_1', 'rmse')
+            val_mape = self._final_eval_metric(evals_result, 'validation_1', 'mape')
+            
+            if val_rmse is None or val_mape is None:
+                y_val_pred = self._predict_array(X_val_arr)
+                val_rmse = np.sqrt(np.mean((y_val - y_val_pred) ** 2))
+                val_mape = calculate_mape(y_val, y_val_pred) / 100
+            
+            # XGBoost 'mape' là tỉ lệ → đổi sang %
+            val_mape = val_mape * 100
             
             metrics.update({
                 'val_rmse': val_rmse,
@@ -138,16 +190,40 @@ class XGBoostModelWrapper:
         
         return metrics
     
+    def _final_eval_metric(
+        self,
+        evals_result: Dict[str, Dict[str, list]],
+        eval_name: str,
+        metric: str
+    ) -> Optional[float]:
+        """
+        Lấy giá trị metric tại best_iteration (hoặc iteration cuối) từ evals_result_
+        
+        Args:
+            evals_result: XGBRegressor.evals_result()
+            eval_name: 'validation_0' (train) / 'validation_1' (val)
+            metric: Metric name
+        
+        Returns:
+            float hoặc None nếu metric không được track
+        """
+        history = evals_result.get(eval_name, {}).get(metric)
+        if not history:
+            return None
+        
+        best_iteration = getattr(self.pipeline.named_steps['model'], 'best_iteration', None)
+        return float(history[best_iteration if best_iteration is not None else -1])
+    
     def predict(
         self,
-        X: pd.DataFrame,
+        X: Union[pd.DataFrame, np.ndarray],
         return_confidence: bool = True
     ) -> Tuple[np.ndarray, Optional[Tuple[np.ndarray, np.ndarray]]]:
         """
         Generate predictions
         
         Args:
-            X: Features
+            X: Features (DataFrame, hoặc ndarray đã theo thứ tự feature_names)
             return_confidence: Return confidence intervals
         
         Returns:
@@ -157,25 +233,225 @@ class XGBoostModelWrapper:
         if not self.is_fitted:
             raise ValueError("Pipeline chưa được fit!")
         
-        # Select features
-        X_selected = X[self.feature_names]
+        # Select features (float32 contiguous)
+        X_arr = self._select_features(X)
         
         # Predict
-        predictions = self.pipeline.predict(X_selected)
+        predictions = self._predict_array(X_arr)
         
         if not return_confidence:
             return predictions, None
         
         # Calculate confidence intervals (simplified bootstrap)
         confidence_lower, confidence_upper = self._calculate_confidence_intervals(
-            X_selected, predictions
+            predictions
         )
         
         return predictions, (confidence_lower, confidence_upper)
     
-    def _calculate_confidence_intervals(
+    def predict_stream(
         self,
         X: pd.DataFrame,
+        chunk_size: int = 65536
+    ) -> Iterator[np.ndarray]:
+        """
+        Point predictions theo từng block rows (generator)
+        
+        Peak memory bị chặn bởi chunk_size × n_features × 4 bytes thay vì
+        toàn bộ X. Không tính confidence intervals theo chunk (bootstrap
+        resample trong batch → kết quả phụ thuộc chunk_size): caller gọi
+        _calculate_confidence_intervals trên predictions đã ghép.
+        
+        Args:
+            X: Features
+            chunk_size: Số rows mỗi chunk
+        
+        Yields:
+            Predictions cho mỗi chunk
+        """
+        if not self.is_fitted:
+            raise ValueError("Pipeline chưa được fit!")
+        
+        for start in range(0, len(X), chunk_size):
+            X_arr = self._select_features(X.iloc[start:start + chunk_size])
+            yield self._predict_array(X_arr)
+    
+    def _select_features(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        Lấy các cột self.feature_names từ X thành float32 array
+        
+        Vị trí cột được cache theo X.columns, tránh label-based
+        reindexing của pandas (X[self.feature_names]) mỗi lần predict.
+        ndarray được coi là đã đúng thứ tự feature_names.
+        
+        Args:
+            X: Features DataFrame hoặc ndarray (n_samples, n_features)
+        
+        Returns:
+            np.ndarray: (n_samples, n_features) float32, C-contiguous
+        """
+        if isinstance(X, np.ndarray):
+            if X.ndim != 2 or X.shape[1] != len(self.feature_names):
+                raise ValueError(
+                    f"Expected array shape (n, {len(self.feature_names)}), got {X.shape}"
+                )
+            return np.ascontiguousarray(X, dtype=np.float32)
+        
+        columns = X.columns
+        
+        if columns is not self._columns_ref:
+            columns_key = tuple(columns)
+            
+            if self._col_idx is None or columns_key != self._columns_key:
+                col_idx = columns.get_indexer(self.feature_names)
+                
+                if (col_idx < 0).any():
+                    missing = [f for f, i in zip(self.feature_names, col_idx) if i < 0]
+                    raise KeyError(f"Missing features: {missing}")
+                
+                self._col_idx = col_idx.astype(np.intp)
+                self._columns_key = columns_key
+            
+            self._columns_ref = columns
+        
+        X_arr = X.to_numpy().take(self._col_idx, axis=1)
+        return X_arr.astype(np.float32, copy=False)
+    
+    def _predict_array(self, X_arr: np.ndarray) -> np.ndarray:
+        """
+        Predict trực tiếp trên numpy buffer bằng booster.inplace_predict
+        
+        Bỏ qua việc build DMatrix (copy N×F) của XGBRegressor.predict.
+        Giữ đúng best_iteration khi model được train với early stopping.
+        Artifacts cũ (trước khi bỏ scaler) vẫn có step 'scaler' → scale
+        trước khi predict.
+        
+        Args:
+            X_arr: Features (float32, C-contiguous)
+        
+        Returns:
+            np.ndarray: Predictions
+        """
+        scaler = self.pipeline.named_steps.get('scaler')
+        if scaler is not None:
+            X_arr = np.ascontiguousarray(scaler.transform(X_arr), dtype=np.float32)
+        
+        if self._fast_predictor is not None:
+            return self._fast_predictor.predict(self._fast_dmatrix(X_arr)).ravel()
+        
+        xgb_model = self.pipeline.named_steps['model']
+        
+        best_iteration = getattr(xgb_model, 'best_iteration', None)
+        iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+        
+        return xgb_model.get_booster().inplace_predict(
+            X_arr, iteration_range=iteration_range
+        )
+    
+    def compile_fast_predictor(
+        self,
+        libpath: str = "model.so",
+        toolchain: str = "gcc",
+        parallel_comp: int = None
+    ) -> bool:
+        """
+        Compile booster thành shared library chuyên biệt rồi load ngay
+        
+        Tiện cho local / notebook. Khi deploy nên tách: export_fast_predictor
+        lúc build image, load_fast_predictor lúc process start.
+        
+        Args:
+            libpath: Output path của shared library
+            toolchain: C compiler (gcc / clang)
+            parallel_comp: Chia code thành N files để compile song song
+        
+        Returns:
+            bool: True nếu compile + load thành công
+        """
+        if not self.export_fast_predictor(libpath, toolchain, parallel_comp):
+            return False
+        
+        return self.load_fast_predictor(libpath)
+    
+    def export_fast_predictor(
+        self,
+        libpath: str = "model.so",
+        toolchain: str = "gcc",
+        parallel_comp: int = None
+    ) -> bool:
+        """
+        Export booster thành shared library (treelite + tl2cgen) - build time
+        
+        Mỗi cây được sinh thành code so sánh thẳng hàng cho đúng số features,
+        thay cho tree traversal generic của XGBoost. Chạy một lần khi build,
+        để serving không cần compiler và không có compile latency.
+        
+        Args:
+            libpath: Output path của shared library
+            toolchain: C compiler (gcc / clang)
+            parallel_comp: Chia code thành N files để compile song song
+        
+        Returns:
+            bool: True nếu export thành công
+        """
+        if not self.is_fitted:
+            raise ValueError("Pipeline chưa được fit!")
+        
+        try:
+            import treelite
+            import tl2cgen
+        except ImportError:
+            logger.warning("treelite/tl2cgen not installed, cannot export predictor")
+            return False
+        
+        # Cắt booster tại best_iteration để giữ đúng kết quả early stopping
+        xgb_model = self.pipeline.named_steps['model']
+        booster = xgb_model.get_booster()
+        best_iteration = getattr(xgb_model, 'best_iteration', None)
+        if best_iteration is not None:
+            booster = booster[:best_iteration + 1]
+        
+        params = {'parallel_comp': parallel_comp} if parallel_comp else {}
+        
+        logger.info(f"⚙️ Compiling XGBoost booster → {libpath}")
+        model = treelite.frontend.from_xgboost(booster)
+        tl2cgen.export_lib(model, toolchain=toolchain, libpath=libpath, params=params)
+        
+        return True
+    
+    def load_fast_predictor(self, libpath: str) -> bool:
+        """
+        Load shared library đã export sẵn - process start
+        
+        Chạy một predict warm-up trên 1 row để dlopen / page-in xảy ra
+        ngay lúc load, không rơi vào request đầu tiên.
+        
+        Args:
+            libpath: Path của shared library (từ export_fast_predictor)
+        
+        Returns:
+            bool: True nếu load thành công
+        """
+        try:
+            import tl2cgen
+        except ImportError:
+            logger.warning("tl2cgen not installed, using XGBoost predictor")
+            return False
+        
+        predictor = tl2cgen.Predictor(libpath)
+        
+        # Warm-up
+        n_features = len(self.feature_names) if self.feature_names else predictor.num_feature
+        predictor.predict(tl2cgen.DMatrix(np.zeros((1, n_features), dtype=np.float32)))
+        
+        self._fast_predictor = predictor
+        self._fast_dmatrix = tl2cgen.DMatrix
+        logger.info(f"  ✅ Compiled predictor loaded: {libpath}")
+        
+        return True
+    
+    def _calculate_confidence_intervals(
+        self,
         predictions: np.ndarray,
         n_bootstrap: int = 10,
         confidence: float = 0.95
@@ -184,8 +460,7 @@ class XGBoostModelWrapper:
         Calculate prediction confidence intervals using bootstrap
         
         Args:
-            X: Features
-            predictions: Point predictions
+            predictions: Point predictions (toàn bộ batch)
             n_bootstrap: Number of bootstrap samples
             confidence: Confidence level
         
@@ -193,18 +468,12 @@ class XGBoostModelWrapper:
             Tuple: (lower_bounds, upper_bounds)
         """
         # Bootstrap predictions
-        bootstrap_preds = []
-        
-        for _ in range(n_bootstrap):
-            # Sample with replacement
-            indices = np.random.choice(len(X), size=len(X), replace=True)
-            X_boot = X.iloc[indices]
-            
-            # Predict
-            pred_boot = self.pipeline.predict(X_boot)
-            bootstrap_preds.append(pred_boot)
-        
-        bootstrap_preds = np.array(bootstrap_preds)
+        # Model là deterministic: predict(X[indices]) == predictions[indices],
+        # nên gom tất cả resample thành một phép gather thay vì n_bootstrap
+        # lần traverse cây. Indices được rút một lần (cùng RNG stream với
+        # np.random.choice từng vòng).
+        indices = np.random.randint(0, len(predictions), size=(n_bootstrap, len(predictions)))
+        bootstrap_preds = np.asarray(predictions)[indices]
         
         # Calculate percentiles
         alpha = (1 - confidence) / 2
@@ -262,4 +531,10 @@ class XGBoostModelWrapper:
     
     def get_pipeline(self) -> Pipeline:
         """Get sklearn pipeline"""
-        return self.pipeline
\ No newline at end of file
+        return self.pipeline
+    
+    def get_booster(self):
+        """Get trained xgb.Booster (vd để warm-start model khác)"""
+        if not self.is_fitted:
+            raise ValueError("Pipeline chưa được fit!")
+        return self.pipeline.named_steps['model'].get_booster()
\ No newline at end of file
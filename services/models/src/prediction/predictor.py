@@ -4,11 +4,32 @@ prediction/predictor.py
 """
 import logging
 import json
+import time
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from typing import Dict, Any, Tuple
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Tuple
 logger = logging.getLogger(__name__)
+
+# Banner dựng sẵn một lần, không nối chuỗi mỗi lần log
+_SEP = "=" * 70
+
+_ONE_HOUR = np.timedelta64(1, 'h')
+
+def _to_hours(target_dates, target_hours) -> np.ndarray:
+    """
+    (date, hour) → datetime64[h], vectorized cho scalar hoặc arrays
+    
+    Args:
+        target_dates: Date string (YYYY-MM-DD) hoặc list/array các dates
+        target_hours: Hour (int/str) hoặc list/array các hours
+    
+    Returns:
+        np.ndarray: datetime64[h]
+    """
+    days = np.asarray(target_dates, dtype='datetime64[h]')
+    return days + np.asarray(target_hours, dtype=np.int64).astype('timedelta64[h]')
+
 class ModelPredictor:
     """
     Orchestrates prediction pipeline
@@ -23,8 +44,11 @@ class ModelPredictor:
     
     def __init__(self, config):
         self.config = config
-        self.start_time = None
         self.end_time = None
+        self.duration_seconds = None
+        
+        # Cache: tuple(feature columns) → positional indexer của features
+        self._feature_idx_cache: Dict[tuple, np.ndarray] = {}
     
     def predict(
         self,
@@ -45,98 +69,210 @@ class ModelPredictor:
         Returns:
             Dict: Prediction results
         """
-        self.start_time = datetime.utcnow()
+        return self.predict_many(
+            data_loader,
+            feature_strategy,
+            model_registry,
+            [target_datetime]
+        )[0]
+    
+    def predict_many(
+        self,
+        data_loader,
+        feature_strategy,
+        model_registry,
+        target_datetimes: List[Tuple[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate predictions cho nhiều target datetimes (backtest/replay)
+        
+        Model và Gold window chỉ load một lần, features tính một lần trên
+        toàn window, predict một lần trên ma trận X xếp chồng.
+        
+        Args:
+            data_loader: DataLoader instance
+            feature_strategy: Feature engineering strategy
+            model_registry: ModelRegistry for loading model
+            target_datetimes: List (date, hour) — mỗi phần tử predict giờ kế tiếp
+        
+        Returns:
+            List[Dict]: Prediction results, cùng thứ tự với target_datetimes
+        """
+        # Monotonic timer cho duration; wall-clock chỉ đọc một lần lúc build output
+        t0 = time.perf_counter_ns()
+        
+        if not target_datetimes:
+            return []
         
-        target_date, target_hour = target_datetime
-        predict_hour = int(target_hour) + 1  # Predict NEXT hour
-        if predict_hour >= 24:
-            predict_hour = 0
-            # Adjust date to next day
-            target_date_obj = datetime.strptime(target_date, "%Y-%m-%d")
-            target_date = (target_date_obj + timedelta(days=1)).strftime("%Y-%m-%d")
+        target_dates, target_hours = zip(*target_datetimes)
         
-        logger.info("=" * 70)
-        logger.info(f"🔮 GENERATING PREDICTION FOR {target_date} {predict_hour:02d}:00")
-        logger.info("=" * 70)
+        # Data đến hết target hour, predict NEXT hour: datetime64 tự roll ngày
+        based_on = _to_hours(list(target_dates), [int(h) for h in target_hours])
+        prediction_for = np.datetime_as_string(based_on + _ONE_HOUR, unit='h')
+        
+        window_end = based_on.max()
+        span_hours = int((window_end - based_on.min()) // _ONE_HOUR)
+        end_date, end_hour = str(window_end).split('T')
+        
+        logger.info("%s\n🔮 GENERATING %d PREDICTION(S): %s:00 → %s:00\n%s",
+                    _SEP, len(prediction_for),
+                    prediction_for[0].replace('T', ' '),
+                    prediction_for[-1].replace('T', ' '), _SEP)
         
         try:
             # Step 1: Load model
-            logger.info("\n" + "=" * 70)
-            logger.info("STEP 1: LOADING MODEL")
-            logger.info("=" * 70)
+            logger.info("\n%s\nSTEP 1: LOADING MODEL\n%s", _SEP, _SEP)
             
             model_pipeline = model_registry.load_model(
                 model_type=self.config.MODEL_TYPE,
                 version="latest"
             )
-            logger.info(f"✅ Loaded {self.config.MODEL_TYPE} model")
+            logger.info("✅ Loaded %s model", self.config.MODEL_TYPE)
             
             # Step 2: Load recent Gold data
-            logger.info("\n" + "=" * 70)
-            logger.info("STEP 2: LOADING HISTORICAL DATA")
-            logger.info("=" * 70)
+            logger.info("\n%s\nSTEP 2: LOADING HISTORICAL DATA\n%s", _SEP, _SEP)
             
-            # Load last N hours of Gold data (for feature engineering)
+            # Một window phủ mọi target: N giờ lịch sử trước target sớm nhất
             df_historical = data_loader.load_recent_hourly_gold(
-                end_date=target_date,
-                end_hour=target_hour,
-                hours=self.config.MIN_HISTORICAL_HOURS
+                end_date=end_date,
+                end_hour=end_hour,
+                hours=self.config.MIN_HISTORICAL_HOURS + span_hours
             )
             
-            logger.info(f"✅ Loaded {len(df_historical)} hours of historical data")
+            logger.info("✅ Loaded %d hours of historical data", len(df_historical))
             
             # Step 3: Feature engineering
-            logger.info("\n" + "=" * 70)
-            logger.info("STEP 3: FEATURE ENGINEERING")
-            logger.info("=" * 70)
-            
-            df_features = feature_strategy.create_features(df_historical)
+            logger.info("\n%s\nSTEP 3: FEATURE ENGINEERING\n%s", _SEP, _SEP)
             
-            # Get the LAST row (most recent hour) for prediction
-            X_predict = df_features.iloc[[-1]]  # Keep as DataFrame
+            df_features = feature_strategy.create_features(df_historical, in_place=True)
             
-            # Remove target and excluded features
-            exclude_cols = self.config.EXCLUDE_FEATURES
-            feature_cols = [c for c in X_predict.columns if c not in exclude_cols]
-            X_predict = X_predict[feature_cols]
+            # Row của mỗi target = row có datetime == target hour
+            # (single-shot → row cuối); bỏ target và excluded features
+            feature_idx = self._get_feature_idx(
+                df_features.columns,
+                getattr(model_pipeline, 'feature_names', None)
+            )
+            row_idx = self._get_row_idx(df_features, based_on)
+            X_predict = df_features.iloc[row_idx, feature_idx].to_numpy(dtype=np.float32)
             
-            logger.info(f"✅ Prepared features: {len(feature_cols)} columns")
+            logger.info("✅ Prepared features: %d rows × %d columns", *X_predict.shape)
             
             # Step 4: Generate prediction
-            logger.info("\n" + "=" * 70)
-            logger.info("STEP 4: GENERATING PREDICTION")
-            logger.info("=" * 70)
-            
-            predictions, (conf_lower, conf_upper) = model_pipeline.predict(
-                X_predict, return_confidence=True
-            )
+            logger.info("\n%s\nSTEP 4: GENERATING PREDICTION\n%s", _SEP, _SEP)
             
-            predicted_value = predictions[0]
-            conf_lower_value = conf_lower[0]
-            conf_upper_value = conf_upper[0]
+            # Predict từng target riêng: bootstrap CI resample trong batch,
+            # gộp targets sẽ trộn predictions của giờ khác vào interval
+            results = [
+                model_pipeline.predict(X_predict[i:i + 1], return_confidence=True)
+                for i in range(len(X_predict))
+            ]
+            predictions = np.concatenate([preds for preds, _ in results])
+            conf_lower = np.concatenate([conf[0] for _, conf in results])
+            conf_upper = np.concatenate([conf[1] for _, conf in results])
             
-            logger.info(f"✅ Predicted: {predicted_value:.2f}")
-            logger.info(f"   Confidence: [{conf_lower_value:.2f}, {conf_upper_value:.2f}]")
+            if len(predictions) == 1:
+                logger.info("✅ Predicted: %.2f", predictions[0])
+                logger.info("   Confidence: [%.2f, %.2f]", conf_lower[0], conf_upper[0])
+            else:
+                logger.info("✅ Predicted %d hours", len(predictions))
             
             # Step 5: Prepare output
-            self.end_time = datetime.utcnow()
-            
-            result = {
-                'prediction_for': f"{target_date}T{predict_hour:02d}:00:00",
-                'predicted_value': float(predicted_value),
-                'confidence_lower': float(conf_lower_value),
-                'confidence_upper': float(conf_upper_value),
-                'model_type': self.config.MODEL_TYPE,
-                'model_version': 'latest',
-                'generated_at': self.end_time.isoformat(),
-                'based_on_data_until': f"{target_date}T{target_hour}:00:00",
-                'feature_count': len(feature_cols),
-                'historical_hours_used': len(df_historical)
-            }
+            self.end_time = datetime.now(timezone.utc)
+            self.duration_seconds = (time.perf_counter_ns() - t0) / 1e9
+            generated_at = self.end_time.isoformat()
+            logger.info("⏱️ Prediction took %.3fs", self.duration_seconds)
+            feature_count = len(feature_idx)
+            historical_hours_used = len(df_historical)
+            model_type = self.config.MODEL_TYPE
             
-            return result
+            return [
+                {
+                    'prediction_for': f"{pred_for}:00:00",
+                    'predicted_value': value,
+                    'confidence_lower': lower,
+                    'confidence_upper': upper,
+                    'model_type': model_type,
+                    'model_version': 'latest',
+                    'generated_at': generated_at,
+                    'based_on_data_until': f"{date}T{hour}:00:00",
+                    'feature_count': feature_count,
+                    'historical_hours_used': historical_hours_used
+                }
+                for value, lower, upper, pred_for, date, hour in zip(
+                    predictions.tolist(), conf_lower.tolist(), conf_upper.tolist(),
+                    prediction_for.tolist(), target_dates, target_hours
+                )
+            ]
             
         except Exception as e:
-            logger.error(f"💥 Prediction failed: {e}", exc_info=True)
+            logger.error("💥 Prediction failed: %s", e, exc_info=True)
             raise
+    
+    @staticmethod
+    def _get_row_idx(df_features: pd.DataFrame, based_on: np.ndarray) -> np.ndarray:
+        """
+        Positional row của mỗi target hour trong feature DataFrame
+        
+        Args:
+            df_features: Feature DataFrame (sorted theo datetime)
+            based_on: datetime64[h] của giờ data cuối cho mỗi target
+        
+        Returns:
+            np.ndarray: Row positions
+        """
+        if 'datetime' not in df_features.columns:
+            # Không có datetime → giả định các target liên tiếp ở cuối frame
+            n_rows = len(df_features)
+            return np.arange(n_rows - len(based_on), n_rows)
+        
+        timestamps = df_features['datetime'].to_numpy().astype('datetime64[h]')
+        row_idx = np.searchsorted(timestamps, based_on, side='right') - 1
+        
+        if (row_idx < 0).any():
+            raise ValueError("No feature rows available before target datetime")
+        
+        # Giờ bị thiếu (gap hoặc bị dropna) → không lặng lẽ dùng row cũ hơn
+        mismatched = timestamps[row_idx] != based_on
+        if mismatched.any():
+            raise ValueError(
+                f"No feature rows for target hours: "
+                f"{np.datetime_as_string(based_on[mismatched], unit='h').tolist()}"
+            )
+        
+        return row_idx
+    
+    def _get_feature_idx(
+        self,
+        columns: pd.Index,
+        feature_names: list = None
+    ) -> np.ndarray:
+        """
+        Positional indexer của feature columns
+        
+        Nếu model biết feature_names → theo đúng thứ tự lúc train, ngược lại
+        lấy mọi column không thuộc EXCLUDE_FEATURES. Cache theo
+        (feature schema, model features) → chỉ tính một lần.
+        
+        Args:
+            columns: Columns của feature DataFrame
+            feature_names: Feature names của model (optional)
+        
+        Returns:
+            np.ndarray: Column positions
+        """
+        cache_key = (tuple(columns), tuple(feature_names) if feature_names else None)
+        feature_idx = self._feature_idx_cache.get(cache_key)
+        
+        if feature_idx is None:
+            if feature_names:
+                feature_idx = columns.get_indexer(feature_names)
+                if (feature_idx < 0).any():
+                    missing = [f for f, i in zip(feature_names, feature_idx) if i < 0]
+                    raise ValueError(f"Missing features: {missing}")
+            else:
+                mask = ~columns.isin(self.config.EXCLUDE_FEATURES)
+                feature_idx = np.flatnonzero(mask)
+            self._feature_idx_cache[cache_key] = feature_idx
+        
+        return feature_idx
 
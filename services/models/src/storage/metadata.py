@@ -3,13 +3,40 @@ storage/metadata.py
 📋 Model Metadata Management
 """
 import json
+import heapq
 import logging
+import math
+from collections import defaultdict
 from datetime import datetime
 from typing import Dict, Any, Optional
-from dataclasses import dataclass, asdict, field
+from dataclasses import dataclass, field
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Metrics: lower is better / higher is better
+_LOWER_IS_BETTER = frozenset(['rmse', 'mae', 'mape'])
+_HIGHER_IS_BETTER = frozenset(['r2'])
+
+def _improvement_pct(v1, v2, lower_is_better) -> np.ndarray:
+    """
+    % cải thiện của v2 so với v1 (vectorized, scalar hoặc arrays)
+    
+    lower_is_better: (v1 - v2) / v1, ngược lại: (v2 - v1) / |v1|.
+    Chia cho 0 → inf/nan thay vì raise.
+    """
+    v1 = np.asarray(v1, dtype=np.float64)
+    v2 = np.asarray(v2, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(lower_is_better, (v1 - v2) / v1, (v2 - v1) / np.abs(v1)) * 100
+
 @dataclass
 class TrainingMetadata:
     """Metadata về quá trình training"""
@@ -34,7 +61,8 @@ class TrainingMetadata:
     hyperparameters: dict
     
     def to_dict(self) -> dict:
-        return asdict(self)
+        # Shallow copy: share feature_names / hyperparameters thay vì deep-copy
+        return dict(self.__dict__)
     
     @classmethod
     def from_dict(cls, data: dict) -> 'TrainingMetadata':
@@ -59,10 +87,16 @@ class ModelMetadata:
     notes: str = ""
     
     def to_dict(self) -> dict:
-        data = asdict(self)
-        # Convert training metadata
-        data['training'] = self.training.to_dict()
-        return data
+        # Flat dict share references (JSON serializers không mutate),
+        # training chỉ convert một lần
+        return {
+            'model_type': self.model_type,
+            'version': self.version,
+            'training': self.training.to_dict(),
+            'metrics': self.metrics,
+            'tags': self.tags,
+            'notes': self.notes
+        }
     
     @classmethod
     def from_dict(cls, data: dict) -> 'ModelMetadata':
@@ -73,12 +107,18 @@ class ModelMetadata:
     
     def to_json(self, indent: int = 2) -> str:
         """Convert to JSON string"""
+        # orjson chỉ hỗ trợ indent 2
+        if orjson is not None and indent == 2:
+            return orjson.dumps(
+                self.to_dict(),
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+            ).decode()
         return json.dumps(self.to_dict(), indent=indent)
     
     @classmethod
     def from_json(cls, json_str: str) -> 'ModelMetadata':
         """Create from JSON string"""
-        data = json.loads(json_str)
+        data = orjson.loads(json_str) if orjson is not None else json.loads(json_str)
         return cls.from_dict(data)
 
 class MetadataManager:
@@ -88,6 +128,21 @@ class MetadataManager:
     
     def __init__(self):
         self.metadata_history = []
+        
+        # Heap index per metric: (value, idx) cho minimize, (-value, idx) cho maximize
+        # → get_best_model O(1) thay vì scan toàn bộ history
+        self._min_heaps = defaultdict(list)
+        self._max_heaps = defaultdict(list)
+        
+        # Columnar history (SoA): column name → list, build pa.Table khi cần
+        self._history_builder: Dict[str, list] = {
+            'model_type': [],
+            'version': [],
+            'completed_at': [],
+            'duration_seconds': [],
+            'total_samples': [],
+        }
+        self._history_table = None
     
     def create_training_metadata(
         self,
@@ -169,9 +224,65 @@ class MetadataManager:
         )
         
         self.metadata_history.append(metadata)
+        self._index_metrics(metadata, len(self.metadata_history) - 1)
+        self._append_history_row(metadata)
         
         return metadata
     
+    def _index_metrics(self, metadata: ModelMetadata, idx: int):
+        """Push metrics của một model vào heap index (bỏ qua None/NaN)"""
+        for metric, value in metadata.metrics.items():
+            if value is None or math.isnan(value):
+                continue
+            heapq.heappush(self._min_heaps[metric], (value, idx))
+            heapq.heappush(self._max_heaps[metric], (-value, idx))
+    
+    def _append_history_row(self, metadata: ModelMetadata):
+        """Append một model vào columnar history (metric columns: metric_<name>)"""
+        builder = self._history_builder
+        n_rows = len(builder['version'])
+        
+        builder['model_type'].append(metadata.model_type)
+        builder['version'].append(metadata.version)
+        builder['completed_at'].append(metadata.training.completed_at)
+        builder['duration_seconds'].append(metadata.training.duration_seconds)
+        builder['total_samples'].append(metadata.training.total_samples)
+        
+        for metric, value in metadata.metrics.items():
+            column = builder.get(f"metric_{metric}")
+            if column is None:
+                # Metric mới → pad các rows trước bằng null
+                column = builder[f"metric_{metric}"] = [None] * n_rows
+            column.append(None if value is None else float(value))
+        
+        # Metric không có ở model này → null
+        for name, column in builder.items():
+            if len(column) == n_rows:
+                column.append(None)
+        
+        self._history_table = None
+    
+    def history_table(self) -> pa.Table:
+        """
+        Metadata history dạng columnar Arrow table (cache tới lần append kế)
+        
+        Returns:
+            pa.Table: Một row mỗi model, metrics ở các cột metric_<name>
+        """
+        if self._history_table is None:
+            self._history_table = pa.Table.from_pydict(self._history_builder)
+        return self._history_table
+    
+    def to_feather(self, path: str):
+        """
+        Persist history ra Feather (zstd) để reload nhanh giữa các processes
+        
+        Args:
+            path: Output file path
+        """
+        feather.write_feather(self.history_table(), path, compression='zstd')
+        logger.info(f"✅ Saved metadata history ({len(self.metadata_history)} models): {path}")
+    
     def compare_versions(
         self,
         version1: ModelMetadata,
@@ -193,13 +304,13 @@ class MetadataManager:
         v2_metric = version2.metrics.get(metric, float('inf'))
         
         # For RMSE/MAE/MAPE - lower is better
-        if metric in ['rmse', 'mae', 'mape']:
+        if metric in _LOWER_IS_BETTER:
             is_better = v2_metric < v1_metric
-            improvement = ((v1_metric - v2_metric) / v1_metric) * 100
+            improvement = float(_improvement_pct(v1_metric, v2_metric, True))
         # For R2 - higher is better
-        elif metric in ['r2']:
+        elif metric in _HIGHER_IS_BETTER:
             is_better = v2_metric > v1_metric
-            improvement = ((v2_metric - v1_metric) / abs(v1_metric)) * 100
+            improvement = float(_improvement_pct(v1_metric, v2_metric, False))
         else:
             is_better = None
             improvement = 0
@@ -224,6 +335,43 @@ class MetadataManager:
         
         return comparison
     
+    def rank_versions(self, metric: str = 'rmse') -> list:
+        """
+        Xếp hạng toàn bộ versions theo metric (vectorized trên history_table)
+        
+        Args:
+            metric: Metric to rank
+        
+        Returns:
+            list: [{'version', 'value', 'improvement_vs_previous'}], tốt nhất trước.
+                  Versions thiếu metric bị bỏ qua.
+        """
+        table = self.history_table()
+        column = f"metric_{metric}"
+        if column not in table.column_names:
+            return []
+        
+        lower_is_better = metric not in _HIGHER_IS_BETTER
+        values = table.column(column).to_numpy(zero_copy_only=False).astype(np.float64)
+        versions = table.column('version').to_pylist()
+        
+        # So với version liền trước trong history
+        improvement = np.full(len(values), np.nan)
+        improvement[1:] = _improvement_pct(values[:-1], values[1:], lower_is_better)
+        
+        valid = np.flatnonzero(~np.isnan(values))
+        keys = values[valid] if lower_is_better else -values[valid]
+        order = valid[np.argsort(keys, kind='stable')]
+        
+        return [
+            {
+                'version': versions[i],
+                'value': float(values[i]),
+                'improvement_vs_previous': float(improvement[i])
+            }
+            for i in order
+        ]
+    
     def _generate_comparison_summary(
         self,
         v1: str,
@@ -257,27 +405,13 @@ class MetadataManager:
         Returns:
             ModelMetadata of best model
         """
-        if not self.metadata_history:
+        heap = (self._min_heaps if minimize else self._max_heaps).get(metric)
+        if not heap:
             return None
         
-        best_model = None
-        best_value = float('inf') if minimize else float('-inf')
-        
-        for metadata in self.metadata_history:
-            value = metadata.metrics.get(metric)
-            if value is None:
-                continue
-            
-            if minimize:
-                if value < best_value:
-                    best_value = value
-                    best_model = metadata
-            else:
-                if value > best_value:
-                    best_value = value
-                    best_model = metadata
-        
-        return best_model
+        # Tie → index nhỏ nhất (model được tạo sớm nhất), như scan tuần tự
+        _, idx = heap[0]
+        return self.metadata_history[idx]
     
     def export_metadata_report(self) -> str:
         """
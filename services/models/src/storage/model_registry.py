@@ -2,24 +2,130 @@
 storage/model_registry.py
 💾 Model Registry - Save/Load models to/from S3
 """
+import io
 import logging
 import json
+import mmap
+import os
 import pickle
+import struct
+import tempfile
+from collections import OrderedDict
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import numpy as np
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 logger = logging.getLogger(__name__)
 
+# ============ MODEL ARTIFACT FORMAT ============
+# Pickle protocol 5 với out-of-band buffers:
+#   header (magic, n_buffers, skeleton_len) | buffer lengths | skeleton | buffers
+# Mỗi buffer được align 64 bytes → numpy arrays khi load trỏ thẳng vào
+# vùng nhớ đã download (zero-copy), không allocate + memcpy lại.
+_MODEL_MAGIC = b"MREG5\n"
+_MODEL_HEADER = struct.Struct("<6sIQ")
+_BUFFER_ALIGN = 64
+
+# Multipart upload / range GET song song cho artifacts lớn
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=16,
+    use_threads=True
+)
+
+# zstd level cho model artifacts (3: nhanh, nén tốt với pickle/XGBoost)
+_ZSTD_LEVEL = 3
+
+# Số models giữ trong in-process cache
+_MODEL_CACHE_SIZE = 4
+
+class _PreallocatedWriter(io.RawIOBase):
+    """File-like seekable writer ghi thẳng vào một bytearray cấp phát trước"""
+    
+    def __init__(self, buffer: bytearray):
+        self._view = memoryview(buffer)
+        self._pos = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = offset
+        return self._pos
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def write(self, data) -> int:
+        n = len(data)
+        self._view[self._pos:self._pos + n] = data
+        self._pos += n
+        return n
+
 class ModelRegistry:
     """Manage model versioning và storage trên S3"""
     
-    def __init__(self, bucket_name: str, models_prefix: str = "models"):
+    def __init__(
+        self,
+        bucket_name: str,
+        models_prefix: str = "models",
+        use_accelerate: bool = False,
+        cache_dir: Optional[str] = None
+    ):
         self.bucket_name = bucket_name
         self.models_prefix = models_prefix
-        self.s3_client = boto3.client('s3')
+        # On-disk cache theo ETag (giữ qua các lần restart); None → tắt
+        self.cache_dir = cache_dir
+        # Pool đủ lớn cho upload song song + multipart transfers (max_concurrency)
+        # use_accelerate: S3 Transfer Acceleration (bucket phải bật sẵn)
+        self.s3_client = boto3.client(
+            's3',
+            config=BotoConfig(
+                max_pool_connections=20,
+                retries={'mode': 'adaptive', 'max_attempts': 5},
+                s3={'use_accelerate_endpoint': use_accelerate}
+            )
+        )
+        
+        # LRU cache: (model_type, version, etag) → model object
+        self._model_cache: OrderedDict = OrderedDict()
 
+    def _dumps_json(self, obj) -> bytes:
+        """
+        Serialize metadata/metrics thành JSON (indent 2)
+        
+        orjson xử lý numpy scalars/arrays natively → không cần walk
+        _make_json_safe. Fallback stdlib json khi orjson chưa cài.
+        """
+        if orjson is not None:
+            return orjson.dumps(
+                obj,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            )
+        return json.dumps(self._make_json_safe(obj), indent=2).encode()
+    
     def _make_json_safe(self, obj):
         if isinstance(obj, dict):
             return {k: self._make_json_safe(v) for k, v in obj.items()}
@@ -34,6 +140,66 @@ class ModelRegistry:
         else:
             return obj
     
+    @staticmethod
+    def _dump_model(model: Any) -> bytes:
+        """
+        Serialize model: pickle skeleton + out-of-band numpy buffers
+        
+        Args:
+            model: Model object
+        
+        Returns:
+            bytes: Framed artifact
+        """
+        buffers = []
+        skeleton = pickle.dumps(model, protocol=5, buffer_callback=buffers.append)
+        raws = [buf.raw() for buf in buffers]
+        
+        header = _MODEL_HEADER.pack(_MODEL_MAGIC, len(raws), len(skeleton))
+        header += struct.pack(f"<{len(raws)}Q", *(raw.nbytes for raw in raws))
+        
+        parts = [header, skeleton]
+        offset = len(header) + len(skeleton)
+        for raw in raws:
+            pad = -offset % _BUFFER_ALIGN
+            parts.append(b"\0" * pad)
+            parts.append(raw)
+            offset += pad + raw.nbytes
+        
+        return b"".join(parts)
+    
+    @staticmethod
+    def _load_model_bytes(data) -> Any:
+        """
+        Deserialize artifact từ _dump_model (fallback: pickle thường)
+        
+        Args:
+            data: bytes / bytearray của artifact
+        
+        Returns:
+            Model object
+        """
+        view = memoryview(data)
+        
+        # Artifact cũ (pickle.dumps thẳng)
+        if bytes(view[:len(_MODEL_MAGIC)]) != _MODEL_MAGIC:
+            return pickle.loads(data)
+        
+        _, n_buffers, skeleton_len = _MODEL_HEADER.unpack_from(view, 0)
+        lengths = struct.unpack_from(f"<{n_buffers}Q", view, _MODEL_HEADER.size)
+        
+        offset = _MODEL_HEADER.size + 8 * n_buffers
+        skeleton = view[offset:offset + skeleton_len]
+        offset += skeleton_len
+        
+        buffers = []
+        for length in lengths:
+            offset += -offset % _BUFFER_ALIGN
+            buffers.append(view[offset:offset + length])
+            offset += length
+        
+        return pickle.loads(skeleton, buffers=buffers)
+    
     def save_model(
         self,
         model: Any,
@@ -55,50 +221,112 @@ class ModelRegistry:
         Returns:
             str: S3 URI của model
         """
-        logger.info(f"💾 Saving {model_type} model version {version}...")
+        logger.info("💾 Saving %s model version %s...", model_type, version)
         
         # Model path
         model_path = f"{self.models_prefix}/{model_type}/{version}"
 
-        safe_metadata = self._make_json_safe(metadata)
-        safe_metrics = self._make_json_safe(metrics)
-
         
-        # Save model pickle
+        # Uploads độc lập → chạy song song (boto3 client thread-safe)
         model_key = f"{model_path}/model.pkl"
-        model_bytes = pickle.dumps(model)
-        self.s3_client.put_object(
-            Bucket=self.bucket_name,
-            Key=model_key,
-            Body=model_bytes
-        )
-        logger.info(f"  ✅ Saved model: {model_key}")
+        model_bytes, model_extra_args = self._encode_model(model)
+        uploads = [(model_key, io.BytesIO(model_bytes), "model", model_extra_args)]
         
-        # Save metadata
         if metadata:
             metadata_key = f"{model_path}/metadata.json"
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=metadata_key,
-                Body=json.dumps(safe_metadata, indent=2)
-            )
-            logger.info(f"  ✅ Saved metadata: {metadata_key}")
+            uploads.append((metadata_key, self._dumps_json(metadata), "metadata", None))
         
-        # Save metrics
         if metrics:
             metrics_key = f"{model_path}/metrics.json"
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=metrics_key,
-                Body=json.dumps(safe_metrics, indent=2)
-            )
-            logger.info(f"  ✅ Saved metrics: {metrics_key}")
+            uploads.append((metrics_key, self._dumps_json(metrics), "metrics", None))
         
-        # Update latest symlink
-        self._update_latest(model_type, version)
+        with ThreadPoolExecutor(max_workers=len(uploads)) as executor:
+            futures = [
+                executor.submit(self._put_object, key, body, label, extra_args)
+                for key, body, label, extra_args in uploads
+            ]
+            
+            # Update latest symlink (copy cần model.pkl đã upload xong)
+            futures[0].result()
+            futures.append(executor.submit(self._update_latest, model_type, version))
+            
+            for future in futures:
+                future.result()
         
         return f"s3://{self.bucket_name}/{model_key}"
     
+    def _encode_model(self, model: Any) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Serialize model + nén zstd nếu có zstandard
+        
+        Args:
+            model: Model object
+        
+        Returns:
+            Tuple: (body bytes, ExtraArgs cho upload — Metadata codec)
+        """
+        model_bytes = self._dump_model(model)
+        
+        if zstandard is None:
+            return model_bytes, {}
+        
+        compressed = zstandard.ZstdCompressor(level=_ZSTD_LEVEL, threads=-1).compress(model_bytes)
+        logger.info(
+            "  🗜️ zstd: %.1f MB → %.1f MB",
+            len(model_bytes) / 1024**2, len(compressed) / 1024**2
+        )
+        
+        return compressed, {'ContentEncoding': 'zstd', 'Metadata': {'codec': 'zstd'}}
+    
+    @staticmethod
+    def _decompress_zstd(data) -> bytearray:
+        """
+        Giải nén zstd vào một bytearray writable (size từ frame header)
+        
+        Args:
+            data: Compressed bytes
+        
+        Returns:
+            bytearray: Decompressed bytes
+        """
+        if zstandard is None:
+            raise ImportError("Model artifact is zstd-compressed but zstandard is not installed")
+        
+        size = zstandard.frame_content_size(data)
+        if size < 0:
+            return bytearray(zstandard.ZstdDecompressor().stream_reader(data).read())
+        
+        output = bytearray(size)
+        view = memoryview(output)
+        with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+            pos = 0
+            while pos < size:
+                n = reader.readinto(view[pos:])
+                if not n:
+                    break
+                pos += n
+        
+        return output
+    
+    def _put_object(self, key: str, body, label: str, extra_args: Dict[str, Any] = None):
+        """Upload một object lên S3 (file-like → multipart transfer)"""
+        if isinstance(body, io.IOBase):
+            self.s3_client.upload_fileobj(
+                body,
+                self.bucket_name,
+                key,
+                ExtraArgs=extra_args or None,
+                Config=_TRANSFER_CONFIG
+            )
+        else:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=body,
+                **(extra_args or {})
+            )
+        logger.info("  ✅ Saved %s: %s", label, key)
+    
     def load_model(
         self,
         model_type: str,
@@ -114,26 +342,136 @@ class ModelRegistry:
         Returns:
             Model object
         """
-        logger.info(f"📥 Loading {model_type} model version {version}...")
+        logger.info("📥 Loading %s model version %s...", model_type, version)
         
         model_path = f"{self.models_prefix}/{model_type}/{version}"
         model_key = f"{model_path}/model.pkl"
         
         try:
-            response = self.s3_client.get_object(
+            head = self.s3_client.head_object(
                 Bucket=self.bucket_name,
                 Key=model_key
             )
-            model_bytes = response['Body'].read()
-            model = pickle.loads(model_bytes)
             
-            logger.info(f"  ✅ Loaded model from {model_key}")
+            # ETag đổi khi "latest" được ghi đè → cache tự invalidate
+            cache_key = (model_type, version, head['ETag'])
+            model = self._model_cache.get(cache_key)
+            if model is not None:
+                self._model_cache.move_to_end(cache_key)
+                logger.info("  ✅ Loaded model from cache (%s)", model_key)
+                return model
+            
+            local_path = self._local_cache_path(model_type, head['ETag'])
+            if local_path and os.path.exists(local_path):
+                model = self._load_model_bytes(self._mmap_file(local_path))
+                logger.info("  ✅ Loaded model from disk cache (%s)", local_path)
+            else:
+                model_bytes = self._download_bytes(model_key, head['ContentLength'])
+                if head.get('Metadata', {}).get('codec') == 'zstd':
+                    model_bytes = self._decompress_zstd(model_bytes)
+                if local_path:
+                    self._write_local_cache(local_path, model_bytes)
+                model = self._load_model_bytes(model_bytes)
+            
+            self._model_cache[cache_key] = model
+            if len(self._model_cache) > _MODEL_CACHE_SIZE:
+                self._model_cache.popitem(last=False)
+            
+            logger.info("  ✅ Loaded model from %s", model_key)
             return model
             
         except Exception as e:
-            logger.error(f"  ❌ Failed to load model: {e}")
+            logger.error("  ❌ Failed to load model: %s", e)
             raise
     
+    def pin(self, model_type: str, version: str = "latest") -> Any:
+        """
+        Warm cache lúc process start để predict đầu tiên không phải download
+        
+        Args:
+            model_type: xgboost, lstm, etc.
+            version: v1.0.0 hoặc "latest"
+        
+        Returns:
+            Model object
+        """
+        return self.load_model(model_type, version)
+    
+    def _download_bytes(self, key: str, size: int) -> bytearray:
+        """
+        Download object vào một bytearray cấp phát trước
+        
+        Object lớn được transfer manager chia thành các Range GET song song,
+        mỗi phần ghi thẳng vào offset tương ứng → một allocation duy nhất,
+        không có bản copy trung gian từ read(). Buffer writable nên numpy
+        arrays out-of-band khi unpickle cũng writable.
+        
+        Args:
+            key: S3 key
+            size: ContentLength (từ head_object)
+        
+        Returns:
+            bytearray: Nội dung object
+        """
+        buffer = bytearray(size)
+        self.s3_client.download_fileobj(
+            self.bucket_name,
+            key,
+            _PreallocatedWriter(buffer),
+            Config=_TRANSFER_CONFIG
+        )
+        return buffer
+    
+    def _local_cache_path(self, model_type: str, etag: str) -> Optional[str]:
+        """Path của artifact trong disk cache (None nếu cache tắt)"""
+        if not self.cache_dir:
+            return None
+        # ETag multipart có dạng "<md5>-<parts>" → vẫn an toàn làm filename
+        return os.path.join(self.cache_dir, model_type, etag.strip('"') + ".pkl")
+    
+    @staticmethod
+    def _write_local_cache(path: str, data) -> None:
+        """
+        Ghi artifact (đã giải nén) vào disk cache: temp file + rename atomic
+        → process khác không bao giờ đọc phải file ghi dở.
+        
+        Args:
+            path: Cache file path
+            data: Artifact bytes
+        """
+        try:
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            # Cache chỉ là tối ưu → không làm fail load_model
+            logger.warning("  ⚠️ Could not write model cache %s: %s", path, e)
+    
+    @staticmethod
+    def _mmap_file(path: str) -> mmap.mmap:
+        """
+        Map cache file vào memory (copy-on-write)
+        
+        Page cache được share giữa các processes; ACCESS_COPY → buffer
+        writable nên numpy arrays out-of-band trỏ thẳng vào mapping mà
+        không ghi ngược ra file.
+        
+        Args:
+            path: Cache file path
+        
+        Returns:
+            mmap.mmap: Mapping của file
+        """
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    
     def _update_latest(self, model_type: str, version: str):
         """Update latest symlink"""
         # In S3, we just copy the model to "latest" folder
@@ -146,4 +484,4 @@ class ModelRegistry:
             CopySource=f"{self.bucket_name}/{src_path}/model.pkl",
             Key=f"{dst_path}/model.pkl"
         )
-        logger.info(f"  ✅ Updated latest -> {version}")
\ No newline at end of file
+        logger.info("  ✅ Updated latest -> %s", version)
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+training/_metric_kernels.py
+⚡ Fused metric kernels cho tuning loop (Numba nếu có, fallback NumPy)
+"""
+import math
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# Cùng eps với evaluation.metrics.calculate_mape
+_MAPE_EPS = 1e-8
+
+if njit is not None:
+    # Một pass over y: diff + reduce trong cùng loop, không array tạm
+    @njit(cache=True, fastmath=True, parallel=True)
+    def rmse_kernel(y_true, y_pred):
+        acc = 0.0
+        for i in prange(y_true.shape[0]):
+            d = y_true[i] - y_pred[i]
+            acc += d * d
+        return math.sqrt(acc / y_true.shape[0])
+
+    @njit(cache=True, fastmath=True, parallel=True)
+    def mae_kernel(y_true, y_pred):
+        acc = 0.0
+        for i in prange(y_true.shape[0]):
+            acc += abs(y_true[i] - y_pred[i])
+        return acc / y_true.shape[0]
+
+    @njit(cache=True, fastmath=True, parallel=True)
+    def mape_kernel(y_true, y_pred):
+        acc = 0.0
+        for i in prange(y_true.shape[0]):
+            acc += abs(y_true[i] - y_pred[i]) / max(abs(y_true[i]), _MAPE_EPS)
+        return acc / y_true.shape[0] * 100
+
+else:
+    def rmse_kernel(y_true, y_pred):
+        diff = np.subtract(y_pred, y_true, dtype=np.float64)
+        return math.sqrt(np.dot(diff, diff) / diff.size)
+
+    def mae_kernel(y_true, y_pred):
+        diff = np.subtract(y_pred, y_true, dtype=np.float64)
+        return np.abs(diff, out=diff).mean()
+
+    def mape_kernel(y_true, y_pred):
+        denom = np.abs(y_true, dtype=np.float64)
+        np.maximum(denom, _MAPE_EPS, out=denom)
+        diff = np.subtract(y_true, y_pred, dtype=np.float64)
+        np.abs(diff, out=diff)
+        np.divide(diff, denom, out=diff)
+        return diff.mean() * 100
+
+# metric name → kernel(y_true, y_pred) -> float
+KERNELS = {
+    'rmse': rmse_kernel,
+    'mae': mae_kernel,
+    'mape': mape_kernel,
+}
+
+def warmup():
+    """
+    Compile kernels trước (float64 y_true, float32 y_pred như trong tuning)
+    để trial đầu tiên không phải chờ LLVM. No-op khi không có Numba.
+    """
+    if njit is None:
+        return
+
+    y_true = np.ones(4, dtype=np.float64)
+    y_pred = np.ones(4, dtype=np.float32)
+    for kernel in KERNELS.values():
+        kernel(y_true, y_pred)
@@ -4,6 +4,8 @@ training/callbacks.py
 """
 import logging
 import time
+from array import array
+from collections import defaultdict
 from typing import Dict, Any, Callable
 from datetime import datetime
 
@@ -12,6 +14,8 @@ logger = logging.getLogger(__name__)
 class TrainingCallback:
     """Base class cho training callbacks"""
     
+    __slots__ = ()
+    
     def on_train_begin(self, **kwargs):
         """Called at the beginning of training"""
         pass
@@ -34,6 +38,11 @@ class EarlyStoppingCallback(TrainingCallback):
     Stops training if metric doesn't improve
     """
     
+    __slots__ = (
+        'monitor', 'patience', 'min_delta', 'mode',
+        'wait', 'stopped_epoch', 'best_value', 'should_stop'
+    )
+    
     def __init__(
         self,
         monitor: str = 'val_loss',
@@ -96,6 +105,8 @@ class LoggingCallback(TrainingCallback):
     Logs training progress
     """
     
+    __slots__ = ('log_every', 'start_time')
+    
     def __init__(self, log_every: int = 1):
         """
         Args:
@@ -125,22 +136,27 @@ class MetricTrackerCallback(TrainingCallback):
     Tracks all metrics during training
     """
     
+    __slots__ = ('history',)
+    
     def __init__(self):
-        self.history = {
-            'train_loss': [],
-            'val_loss': []
-        }
+        # array('d'): buffer float64 liền mạch, append amortized O(1).
+        # train_loss / val_loss luôn có; defaultdict chỉ tạo key cho các
+        # metrics khác (bỏ nhánh kiểm tra key mới mỗi epoch)
+        self.history = defaultdict(
+            lambda: array('d'),
+            train_loss=array('d'),
+            val_loss=array('d')
+        )
     
     def on_epoch_end(self, epoch: int, logs: Dict = None, **kwargs):
         if logs:
+            history = self.history
             for key, value in logs.items():
-                if key not in self.history:
-                    self.history[key] = []
-                self.history[key].append(value)
+                history[key].append(value)
     
     def get_history(self) -> Dict:
         """Get training history"""
-        return self.history
+        return {key: values.tolist() for key, values in self.history.items()}
     
     def plot_history(self):
         """Plot training history (requires matplotlib)"""
@@ -183,6 +199,8 @@ class CheckpointCallback(TrainingCallback):
     Saves model at certain intervals
     """
     
+    __slots__ = ('filepath', 'save_best_only', 'monitor', 'mode', 'best_value')
+    
     def __init__(
         self,
         filepath: str,
@@ -229,27 +247,50 @@ class CheckpointCallback(TrainingCallback):
 class CallbackList:
     """
     Manages list of callbacks
+    
+    Bound methods của từng hook được gom sẵn lúc add (bỏ qua hooks
+    không override) → dispatch không cần attribute lookup mỗi epoch.
     """
     
+    _HOOKS = ('on_train_begin', 'on_train_end', 'on_epoch_begin', 'on_epoch_end')
+    
     def __init__(self, callbacks: list = None):
-        self.callbacks = callbacks or []
+        self.callbacks = []
+        self._dispatch = {hook: [] for hook in self._HOOKS}
+        
+        for callback in callbacks or []:
+            self.add(callback)
     
     def add(self, callback: TrainingCallback):
         """Add callback to list"""
         self.callbacks.append(callback)
+        
+        for hook, fns in self._dispatch.items():
+            # Hook không override → no-op của base class, bỏ qua
+            if getattr(type(callback), hook, None) is getattr(TrainingCallback, hook):
+                continue
+            fns.append(getattr(callback, hook))
     
     def on_train_begin(self, **kwargs):
-        for callback in self.callbacks:
-            callback.on_train_begin(**kwargs)
+        for fn in self._dispatch['on_train_begin']:
+            fn(**kwargs)
     
     def on_train_end(self, **kwargs):
-        for callback in self.callbacks:
-            callback.on_train_end(**kwargs)
+        for fn in self._dispatch['on_train_end']:
+            fn(**kwargs)
     
     def on_epoch_begin(self, epoch: int, **kwargs):
-        for callback in self.callbacks:
-            callback.on_epoch_begin(epoch, **kwargs)
+        if kwargs:
+            for fn in self._dispatch['on_epoch_begin']:
+                fn(epoch, **kwargs)
+        else:
+            for fn in self._dispatch['on_epoch_begin']:
+                fn(epoch)
     
     def on_epoch_end(self, epoch: int, logs: Dict = None, **kwargs):
-        for callback in self.callbacks:
-            callback.on_epoch_end(epoch, logs, **kwargs)
\ No newline at end of file
+        if kwargs:
+            for fn in self._dispatch['on_epoch_end']:
+                fn(epoch, logs, **kwargs)
+        else:
+            for fn in self._dispatch['on_epoch_end']:
+                fn(epoch, logs)
@@ -2,31 +2,313 @@
 training/hyperparameter.py
 🎛️ Hyperparameter Tuning
 """
+import itertools
 import logging
+import math
+import threading
 import numpy as np
-from typing import Dict, Any, List, Tuple
-from sklearn.model_selection import ParameterGrid
+import pandas as pd
+import xgboost as xgb
+from typing import Dict, Any, List, Tuple, Optional
+from joblib import Parallel, delayed, effective_n_jobs
+
+from evaluation.metrics import calculate_all_metrics
+from training._metric_kernels import KERNELS as _METRIC_KERNELS, warmup as _warmup_metric_kernels
+
+try:
+    import optuna
+except ImportError:
+    optuna = None
 
 logger = logging.getLogger(__name__)
 
+# Banner dựng sẵn một lần, không nối chuỗi mỗi lần log
+_SEP = "=" * 70
+
+# Metrics XGBoostModelWrapper track trong evals_result (validation_1 = val set)
+_XGB_EVAL_METRICS = ('rmse', 'mape')
+
+# Số curves hoàn thành tối thiểu trước khi bắt đầu prune
+_MIN_PRUNING_REFERENCES = 2
+
+# Params quyết định cấu trúc trees/objective: warm-start chỉ hợp lệ khi
+# trial có cùng giá trị với best trial (khác learning_rate, gamma, ... thì OK)
+_STRUCTURAL_PARAMS = (
+    'max_depth', 'max_leaves', 'grow_policy', 'tree_method',
+    'max_bin', 'booster', 'objective'
+)
+
+class _TrialPruned(Exception):
+    """Raised bởi PruningCallback để dừng trial kém"""
+
+class PruningCallback(xgb.callback.TrainingCallback):
+    """
+    Median pruning + successive halving cho grid/random search
+    
+    So sánh validation metric ở mỗi boosting round với các curves của
+    trials đã hoàn thành ở cùng round:
+    - Sau min_rounds: prune nếu tệ hơn median × tolerance
+    - Tại 1/4 số rounds: giữ top-½ (median, không tolerance)
+    - Tại 1/2 số rounds: giữ top-¼ (quartile)
+    
+    Curve của trial luôn được ghi lại (kể cả khi chưa có reference)
+    để làm reference cho các trials sau.
+    """
+    
+    def __init__(
+        self,
+        metric: str,
+        minimize: bool = True,
+        reference_curves: List[np.ndarray] = None,
+        min_rounds: int = 20,
+        tolerance: float = 1.1
+    ):
+        """
+        Args:
+            metric: XGBoost eval metric name (rmse, mape)
+            minimize: True if lower is better
+            reference_curves: Validation curves của các trials đã hoàn thành
+            min_rounds: Không prune trước round này
+            tolerance: Hệ số nới cho median rule
+        """
+        self.metric = metric
+        self.minimize = minimize
+        self.min_rounds = min_rounds
+        self.tolerance = tolerance
+        self.curve = []
+        
+        self._median = None
+        self._rungs = {}
+        if reference_curves and len(reference_curves) >= _MIN_PRUNING_REFERENCES:
+            # Pad curves (early stopping → độ dài khác nhau) bằng NaN
+            n_rounds = max(len(c) for c in reference_curves)
+            curves = np.full((len(reference_curves), n_rounds), np.nan)
+            for row, c in zip(curves, reference_curves):
+                row[:len(c)] = c
+            
+            self._median = np.nanmedian(curves, axis=0)
+            quartile = np.nanpercentile(curves, 25 if minimize else 75, axis=0)
+            self._rungs = {
+                n_rounds // 4: self._median,
+                n_rounds // 2: quartile
+            }
+    
+    def _is_worse(self, score: float, threshold: float) -> bool:
+        return score > threshold if self.minimize else score < threshold
+    
+    def after_iteration(self, model, epoch: int, evals_log) -> bool:
+        history = evals_log.get('validation_1', {}).get(self.metric)
+        if not history:
+            return False
+        
+        score = float(history[-1])
+        self.curve.append(score)
+        
+        median = self._median
+        if median is None or epoch >= len(median):
+            return False
+        
+        rung = self._rungs.get(epoch)
+        if rung is not None and epoch > 0 and self._is_worse(score, rung[epoch]):
+            raise _TrialPruned(f"rung {epoch}: {score:.4f}")
+        
+        if epoch >= self.min_rounds:
+            threshold = median[epoch] * (self.tolerance if self.minimize else 1 / self.tolerance)
+            if self._is_worse(score, threshold):
+                raise _TrialPruned(f"round {epoch}: {score:.4f} vs median {median[epoch]:.4f}")
+        
+        return False
+
+def _params_key(params: Dict[str, Any]) -> tuple:
+    """
+    Hashable key của một param combination (thứ tự keys không quan trọng);
+    floats làm tròn 6 chữ số → near-duplicates từ random sampling trùng key
+    """
+    return tuple(sorted(
+        (name, round(value, 6) if isinstance(value, float) else value)
+        for name, value in params.items()
+    ))
+
+def _fast_metric(metric: str, y_true: np.ndarray, y_pred: np.ndarray) -> Optional[float]:
+    """
+    Tính riêng một metric (một pass over y_val, kernel fused nếu có Numba);
+    None nếu metric không có fast path → fallback calculate_all_metrics
+    """
+    kernel = _METRIC_KERNELS.get(metric)
+    if kernel is not None:
+        return float(kernel(y_true, y_pred))
+    
+    if metric == 'forecast_bias':
+        return float(np.subtract(y_pred, y_true, dtype=np.float64).mean())
+    return None
+
+def _train_and_score(
+    model_class,
+    params: Dict[str, Any],
+    X_train,
+    y_train,
+    X_val,
+    y_val,
+    metric: str,
+    xgb_model=None
+) -> Tuple[float, np.ndarray, Any]:
+    """
+    Train một model với params và tính metric tối ưu trên validation set
+    
+    Args:
+        xgb_model: Booster để warm-start (None = train từ đầu)
+    
+    Returns:
+        Tuple: (score, y_pred, model)
+    """
+    # Create and train model (BaseModel.train hoặc sklearn-style fit)
+    model = model_class(hyperparameters=params)
+    train = getattr(model, 'train', None) or model.fit
+    if xgb_model is None:
+        train(X_train, y_train, X_val, y_val)
+    else:
+        train(X_train, y_train, X_val, y_val, xgb_model=xgb_model)
+    
+    # Evaluate on validation set
+    y_pred, _ = model.predict(X_val, return_confidence=False)
+    
+    # Chỉ tính metric đang tối ưu; full metrics để dành cho best trial
+    y_true = y_val.to_numpy() if isinstance(y_val, pd.Series) else y_val
+    score = _fast_metric(metric, y_true, y_pred)
+    if score is None:
+        score = calculate_all_metrics(y_true, y_pred)[metric]
+    return score, y_pred, model
+
+def _evaluate_trial(
+    model_class,
+    params: Dict[str, Any],
+    X_train,
+    y_train,
+    X_val,
+    y_val,
+    metric: str,
+    xgb_model=None,
+    keep_booster: bool = False
+) -> Tuple[Dict, Optional[float], Any, Any, Any]:
+    """
+    Train + evaluate một trial (module-level → picklable cho joblib workers)
+    
+    Args:
+        model_class: Model class (nhận hyperparameters=...)
+        params: Hyperparameters của trial
+        X_train, y_train: Training data
+        X_val, y_val: Validation data
+        metric: Metric to optimize
+        xgb_model: Booster để warm-start trial
+        keep_booster: Trả về booster đã train (cho warm-start trials sau)
+    
+    Returns:
+        Tuple: (params, score, y_pred, curve, booster) — curve là validation
+        curve nếu params có PruningCallback. Score None khi trial fail (y_pred
+        là error message) hoặc bị prune (y_pred None, curve là lý do prune)
+    """
+    callbacks = params.get('callbacks') or ()
+    pruner = next((cb for cb in callbacks if isinstance(cb, PruningCallback)), None)
+    curve = pruner.curve if pruner is not None else None
+    
+    try:
+        score, y_pred, model = _train_and_score(
+            model_class, params, X_train, y_train, X_val, y_val, metric, xgb_model
+        )
+        booster = model.get_booster() if keep_booster else None
+        return params, score, y_pred, curve, booster
+        
+    except _TrialPruned as e:
+        return params, None, None, str(e), None
+    except Exception as e:
+        return params, None, str(e), None, None
+
+def _optuna_pruning_callback(trial, metric: str):
+    """
+    XGBoost callback: report validation metric mỗi round cho Optuna trial,
+    raise TrialPruned khi pruner quyết định dừng
+    
+    Args:
+        trial: optuna.Trial
+        metric: XGBoost eval metric name
+    
+    Returns:
+        xgb.callback.TrainingCallback
+    """
+    class _OptunaPruningCallback(xgb.callback.TrainingCallback):
+        def after_iteration(self, model, epoch, evals_log) -> bool:
+            history = evals_log.get('validation_1', {}).get(metric)
+            if history:
+                trial.report(float(history[-1]), step=epoch)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+            return False
+    
+    return _OptunaPruningCallback()
+
 class HyperparameterTuner:
     """
     Hyperparameter tuning cho models
     """
     
-    def __init__(self, model_class, metric: str = 'rmse', minimize: bool = True):
+    def __init__(
+        self,
+        model_class,
+        metric: str = 'rmse',
+        minimize: bool = True,
+        n_jobs: int = 1,
+        backend: str = 'loky'
+    ):
         """
         Args:
             model_class: Model class (e.g., XGBoostModel)
             metric: Metric to optimize
             minimize: True if lower is better
+            n_jobs: Số trials chạy song song (joblib, -1 = mọi cores).
+                Loky tự giới hạn threads của XGBoost trong mỗi worker.
+            backend: 'loky' (processes, data được memmap) hoặc 'threading'
+                (XGBoost nhả GIL khi train → share data không copy)
         """
         self.model_class = model_class
         self.metric = metric
         self.minimize = minimize
+        self.n_jobs = n_jobs
+        self.backend = backend
         self.best_params = None
         self.best_score = float('inf') if minimize else float('-inf')
         self.tuning_history = []
+        
+        # Best trial: history entry + predictions (full metrics tính sau search)
+        self._best_entry = None
+        self._best_pred = None
+        
+        # Booster của best trial (chỉ giữ khi warm_start) + params của nó
+        self._best_booster = None
+        self._best_booster_params = None
+        
+        # Keys của params đã chạy (giữ qua các lần search → grid_search rồi
+        # random_search trên cùng space không train lại combination cũ)
+        self._seen = set()
+        
+        # Một Parallel dùng lại cho mọi searches/waves; loky giữ worker pool
+        # (reusable executor) → workers không import lại sklearn/xgboost.
+        # return_as='generator': xử lý kết quả (log, best, full metrics) ngay
+        # khi trial xong trong lúc workers train trials tiếp theo, và chỉ
+        # giữ predictions của best trial thay vì của mọi trials cùng lúc
+        self._parallel = Parallel(
+            n_jobs=n_jobs,
+            backend=backend,
+            batch_size='auto',
+            return_as='generator'
+        )
+        
+        # Compile metric kernels một lần trước trial đầu tiên
+        _warmup_metric_kernels()
+        
+        # Shared data đã chuẩn bị, cache theo identity của inputs
+        self._shared_key = None
+        self._shared_data = None
+        self._shared_inputs = None
     
     def grid_search(
         self,
@@ -35,7 +317,10 @@ class HyperparameterTuner:
         y_train,
         X_val,
         y_val,
-        max_trials: int = None
+        max_trials: int = None,
+        prune: bool = False,
+        seed: int = None,
+        warm_start: bool = False
     ) -> Tuple[Dict, float]:
         """
         Grid search hyperparameter tuning
@@ -47,64 +332,35 @@ class HyperparameterTuner:
             X_val: Validation features
             y_val: Validation target
             max_trials: Maximum number of combinations to try
+            prune: Dừng sớm trials kém (median pruning, metric rmse/mape)
+            seed: Random seed khi sample max_trials combinations
+            warm_start: Trial tiếp tục từ booster của best trial khi cùng
+                structural params (chỉ khi n_jobs=1)
         
         Returns:
             best_params: Best hyperparameters
             best_score: Best metric score
         """
-        logger.info(f"🎛️ Starting grid search hyperparameter tuning...")
-        logger.info(f"  Optimizing: {self.metric}")
+        X_train, y_train, X_val, y_val = self._prepare_shared_data(
+            X_train, y_train, X_val, y_val
+        )
         
-        # Generate all parameter combinations
-        param_combinations = list(ParameterGrid(param_grid))
+        logger.info("🎛️ Starting grid search hyperparameter tuning...")
+        logger.info("  Optimizing: %s", self.metric)
         
-        if max_trials and len(param_combinations) > max_trials:
-            logger.warning(f"  Limiting to {max_trials} trials (out of {len(param_combinations)})")
-            # Random sample
-            indices = np.random.choice(len(param_combinations), max_trials, replace=False)
-            param_combinations = [param_combinations[i] for i in indices]
+        # Generate parameter combinations (không materialize cả grid)
+        param_combinations = self._grid_combinations(param_grid, max_trials, seed)
         
-        logger.info(f"  Total trials: {len(param_combinations)}")
+        logger.info("  Total trials: %d", len(param_combinations))
         
-        # Try each combination
-        for i, params in enumerate(param_combinations, 1):
-            try:
-                logger.info(f"  Trial {i}/{len(param_combinations)}: {params}")
-                
-                # Create and train model
-                model = self.model_class(hyperparameters=params)
-                model.train(X_train, y_train, X_val, y_val)
-                
-                # Evaluate on validation set
-                y_pred, _ = model.predict(X_val, return_confidence=False)
-                
-                # Calculate metric
-                from evaluation.metrics import calculate_all_metrics
-                metrics = calculate_all_metrics(y_val.values, y_pred)
-                score = metrics[self.metric]
-                
-                logger.info(f"    {self.metric}: {score:.4f}")
-                
-                # Track history
-                self.tuning_history.append({
-                    'params': params,
-                    'score': score,
-                    'metrics': metrics
-                })
-                
-                # Update best
-                if self._is_better(score, self.best_score):
-                    self.best_score = score
-                    self.best_params = params
-                    logger.info(f"    ✨ New best! {self.metric}: {score:.4f}")
-                
-            except Exception as e:
-                logger.error(f"    ❌ Trial {i} failed: {e}")
-                continue
+        # Run trials (song song nếu n_jobs != 1)
+        self._run_trials(
+            param_combinations, X_train, y_train, X_val, y_val, prune, warm_start
+        )
         
-        logger.info(f"✅ Grid search completed")
-        logger.info(f"  Best {self.metric}: {self.best_score:.4f}")
-        logger.info(f"  Best params: {self.best_params}")
+        logger.info("✅ Grid search completed")
+        logger.info("  Best %s: %.4f", self.metric, self.best_score)
+        logger.info("  Best params: %s", self.best_params)
         
         return self.best_params, self.best_score
     
@@ -115,80 +371,472 @@ class HyperparameterTuner:
         y_train,
         X_val,
         y_val,
-        n_trials: int = 10
+        n_trials: int = 10,
+        prune: bool = False,
+        seed: int = None,
+        warm_start: bool = False
     ) -> Tuple[Dict, float]:
         """
         Random search hyperparameter tuning
         
         Args:
-            param_distributions: Dict of (min, max) for each parameter
+            param_distributions: Dict of (min, max) hoặc (min, max, 'log')
+                for each parameter
             X_train: Training features
             y_train: Training target
             X_val: Validation features
             y_val: Validation target
             n_trials: Number of random trials
+            prune: Dừng sớm trials kém (median pruning, metric rmse/mape)
+            seed: Random seed cho sampling
+            warm_start: Trial tiếp tục từ booster của best trial khi cùng
+                structural params (chỉ khi n_jobs=1)
         
         Returns:
             best_params: Best hyperparameters
             best_score: Best metric score
         """
-        logger.info(f"🎲 Starting random search hyperparameter tuning...")
-        logger.info(f"  Trials: {n_trials}")
+        X_train, y_train, X_val, y_val = self._prepare_shared_data(
+            X_train, y_train, X_val, y_val
+        )
         
-        for trial in range(1, n_trials + 1):
-            try:
-                # Sample random parameters
-                params = self._sample_params(param_distributions)
-                
-                logger.info(f"  Trial {trial}/{n_trials}: {params}")
+        logger.info("🎲 Starting random search hyperparameter tuning...")
+        logger.info("  Trials: %d", n_trials)
+        
+        # Sample random parameters (một lần cho mọi trials)
+        param_combinations = self._presample_params(param_distributions, n_trials, seed)
+        
+        # Run trials (song song nếu n_jobs != 1)
+        self._run_trials(
+            param_combinations, X_train, y_train, X_val, y_val, prune, warm_start
+        )
+        
+        logger.info("✅ Random search completed")
+        logger.info("  Best %s: %.4f", self.metric, self.best_score)
+        logger.info("  Best params: %s", self.best_params)
+        
+        return self.best_params, self.best_score
+    
+    def optuna_search(
+        self,
+        param_distributions: Dict[str, tuple],
+        X_train,
+        y_train,
+        X_val,
+        y_val,
+        n_trials: int = 50
+    ) -> Tuple[Dict, float]:
+        """
+        Bayesian search (Optuna TPE) + median pruning
+        
+        TPE học từ các trials trước thay vì sample đều; trials kém bị dừng
+        giữa chừng theo metric của từng boosting round (chỉ khi metric
+        được XGBoost track: rmse/mape).
+        
+        Args:
+            param_distributions: Dict (min, max) hoặc (min, max, 'log') mỗi param
+            X_train: Training features
+            y_train: Training target
+            X_val: Validation features
+            y_val: Validation target
+            n_trials: Number of trials
+        
+        Returns:
+            best_params: Best hyperparameters
+            best_score: Best metric score
+        """
+        if optuna is None:
+            raise ImportError("optuna not installed, cannot run optuna_search")
+        
+        X_train, y_train, X_val, y_val = self._prepare_shared_data(
+            X_train, y_train, X_val, y_val
+        )
+        
+        logger.info("🧠 Starting Optuna (TPE) hyperparameter tuning...")
+        logger.info("  Trials: %d", n_trials)
+        
+        def objective(trial) -> float:
+            params = {}
+            for param_name, (min_val, max_val, *scale) in param_distributions.items():
+                log = bool(scale) and scale[0] == 'log'
+                if isinstance(min_val, int):
+                    params[param_name] = trial.suggest_int(param_name, min_val, max_val, log=log)
+                else:
+                    params[param_name] = trial.suggest_float(param_name, min_val, max_val, log=log)
+            
+            # Report metric mỗi boosting round → MedianPruner cắt trial sớm
+            trial_params = dict(params)
+            if self.metric in _XGB_EVAL_METRICS:
+                trial_params['callbacks'] = [_optuna_pruning_callback(trial, self.metric)]
+            
+            score, y_pred, _ = _train_and_score(
+                self.model_class, trial_params, X_train, y_train, X_val, y_val, self.metric
+            )
+            trial.set_user_attr('params', params)
+            
+            # Giữ predictions của trial tốt nhất (objective chạy trên threads)
+            with best_lock:
+                if best_pred['score'] is None or self._is_better(score, best_pred['score']):
+                    best_pred.update(score=score, number=trial.number, y_pred=y_pred)
+            return float(score)
+        
+        best_pred = {'score': None, 'number': None, 'y_pred': None}
+        best_lock = threading.Lock()
+        
+        study = optuna.create_study(
+            direction='minimize' if self.minimize else 'maximize',
+            sampler=optuna.samplers.TPESampler(),
+            pruner=optuna.pruners.MedianPruner(n_warmup_steps=5)
+        )
+        study.optimize(objective, n_trials=n_trials, n_jobs=self.n_jobs)
+        
+        completed = study.get_trials(
+            deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,)
+        )
+        logger.info("  Completed: %d/%d (rest pruned/failed)", len(completed), len(study.trials))
+        
+        for trial in completed:
+            entry = {
+                'params': trial.user_attrs['params'],
+                'score': trial.value,
+                'metrics': {self.metric: trial.value},
+                'warm_start': False
+            }
+            self.tuning_history.append(entry)
+            if self._is_better(trial.value, self.best_score):
+                self.best_score = trial.value
+                self.best_params = entry['params']
+                self._best_entry = entry
+                self._best_pred = (
+                    best_pred['y_pred'] if trial.number == best_pred['number'] else None
+                )
+        
+        self._finalize_best(y_val)
+        
+        logger.info("✅ Optuna search completed")
+        logger.info("  Best %s: %.4f", self.metric, self.best_score)
+        logger.info("  Best params: %s", self.best_params)
+        
+        return self.best_params, self.best_score
+    
+    def _grid_combinations(
+        self,
+        param_grid: Dict[str, List],
+        max_trials: int = None,
+        seed: int = None
+    ) -> List[Dict]:
+        """
+        Combinations của grid (cùng thứ tự ParameterGrid: keys sorted,
+        key cuối đổi nhanh nhất). Với max_trials < grid size: sample
+        max_trials vị trí không lặp rồi decode mixed-radix → memory và
+        thời gian O(max_trials) thay vì O(∏|values|).
+        
+        Args:
+            param_grid: Dict of hyperparameter ranges
+            max_trials: Maximum number of combinations
+            seed: Random seed
+        
+        Returns:
+            List[Dict]: Parameter combinations
+        """
+        if not param_grid:
+            return [{}]
+        
+        keys, values = zip(*sorted(param_grid.items()))
+        values = [list(v) for v in values]
+        total = math.prod(len(v) for v in values)
+        
+        if not max_trials or total <= max_trials:
+            return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+        
+        logger.warning("  Limiting to %d trials (out of %d)", max_trials, total)
+        
+        rng = np.random.default_rng(seed)
+        combinations = []
+        for index in rng.choice(total, size=max_trials, replace=False).tolist():
+            combo = {}
+            for key, options in zip(reversed(keys), reversed(values)):
+                index, position = divmod(index, len(options))
+                combo[key] = options[position]
+            combinations.append({key: combo[key] for key in keys})
+        
+        return combinations
+    
+    def _prepare_shared_data(self, X_train, y_train, X_val, y_val) -> Tuple:
+        """
+        Chuẩn bị data một lần cho mọi trials (và mọi lần search trên cùng data)
+        
+        Mỗi DataFrame được gom thành một block float32 contiguous: XGBoost
+        quantize features trên float32 → float64 chỉ tốn gấp đôi RAM và
+        bandwidth. Trial convert sang array là view (không ghép từng column),
+        joblib memmap một buffer duy nhất cho workers thay vì N column arrays.
+        Targets thành ndarray contiguous (không còn .values mỗi trial):
+        y_train float32 (label của XGBoost); y_val giữ float64 cho metrics.
+        
+        Returns:
+            Tuple: (X_train, y_train, X_val, y_val) — X là DataFrames
+            (model cần column names), y là ndarrays
+        """
+        key = (id(X_train), id(y_train), id(X_val), id(y_val))
+        if key == self._shared_key:
+            return self._shared_data
+        
+        def consolidate_frame(X: pd.DataFrame) -> pd.DataFrame:
+            return pd.DataFrame(
+                np.ascontiguousarray(X.to_numpy(dtype=np.float32)),
+                index=X.index,
+                columns=X.columns
+            )
+        
+        def to_array(y, dtype) -> np.ndarray:
+            if isinstance(y, pd.Series):
+                y = y.to_numpy(dtype=dtype)
+            return np.ascontiguousarray(y, dtype=dtype)
+        
+        self._shared_data = (
+            consolidate_frame(X_train),
+            to_array(y_train, np.float32),
+            consolidate_frame(X_val),
+            to_array(y_val, np.float64)
+        )
+        # Giữ references của inputs → id() không bị tái sử dụng
+        self._shared_key = key
+        self._shared_inputs = (X_train, y_train, X_val, y_val)
+        
+        return self._shared_data
+    
+    def _run_trials(
+        self,
+        param_combinations: List[Dict],
+        X_train,
+        y_train,
+        X_val,
+        y_val,
+        prune: bool = False,
+        warm_start: bool = False
+    ):
+        """
+        Chạy các trials qua joblib, cập nhật history/best tuần tự ở process
+        chính (không có shared state giữa workers). Arrays lớn được joblib
+        tự memmap (max_nbytes) thay vì pickle copy cho từng worker.
+        
+        Với prune=True, trials chạy theo từng đợt (mỗi đợt = số workers):
+        mỗi trial nhận PruningCallback với curves của các trials đã xong.
+        
+        Với warm_start=True (chỉ n_jobs=1), trials chạy tuần tự: trial có
+        cùng structural params với best trial nhận xgb_model = booster của
+        best trial → thêm trees tiếp thay vì train lại từ đầu. Score warm
+        gồm cả trees của parent (không tái lập được từ params): trial vượt
+        best được fit lại từ đầu trước khi nhận làm best; các trial còn lại
+        ghi vào history với 'warm_start': True và không tham gia so sánh
+        (best, pruning curves, ranking trong report).
+        
+        Args:
+            param_combinations: List hyperparameters
+            X_train, y_train: Training data
+            X_val, y_val: Validation data
+            prune: Median pruning / successive halving (metric rmse/mape)
+            warm_start: Warm-start từ booster của best trial
+        """
+        param_combinations = self._skip_seen(param_combinations)
+        n_trials = len(param_combinations)
+        
+        prune = prune and self.metric in _XGB_EVAL_METRICS
+        n_workers = effective_n_jobs(self.n_jobs)
+        if warm_start and n_workers != 1:
+            # Booster của best trial chỉ có sau khi trial xong → song song
+            # thì các trials cùng đợt không dùng được; giữ parallelism
+            logger.warning("  warm_start bị tắt khi n_jobs != 1")
+            warm_start = False
+        
+        if warm_start:
+            wave_size = 1
+        else:
+            wave_size = n_workers if prune else n_trials
+        curves = []
+        
+        for start in range(0, n_trials, max(wave_size, 1)):
+            wave = param_combinations[start:start + wave_size]
+            
+            if prune:
+                reference = list(curves)
+                wave_params = [
+                    {**params, 'callbacks': [PruningCallback(self.metric, self.minimize, reference)]}
+                    for params in wave
+                ]
+            else:
+                wave_params = wave
+            
+            warm_boosters = [
+                self._warm_start_booster(params) if warm_start else None
+                for params in wave
+            ]
+            
+            results = self._parallel(
+                delayed(_evaluate_trial)(
+                    self.model_class, params, X_train, y_train, X_val, y_val, self.metric,
+                    xgb_model, warm_start
+                )
+                for params, xgb_model in zip(wave_params, warm_boosters)
+            )
+            
+            # Lặp theo results (không zip với wave): generator phải chạy đến
+            # StopIteration thì self._parallel mới nhận wave tiếp theo
+            for offset, (_, score, y_pred, curve, booster) in enumerate(results):
+                i = start + offset + 1
+                params = wave[offset]
+                xgb_model = warm_boosters[offset]
+                logger.info("  Trial %d/%d: %s", i, n_trials, params)
                 
-                # Create and train model
-                model = self.model_class(hyperparameters=params)
-                model.train(X_train, y_train, X_val, y_val)
+                if score is None:
+                    if y_pred is None:
+                        logger.info("    ✂️ Trial %d pruned (%s)", i, curve)
+                    else:
+                        logger.error("    ❌ Trial %d failed: %s", i, y_pred)
+                    continue
                 
-                # Evaluate
-                y_pred, _ = model.predict(X_val, return_confidence=False)
+                warm = xgb_model is not None
+                if curve and not warm:
+                    curves.append(np.asarray(curve))
                 
-                from evaluation.metrics import calculate_all_metrics
-                metrics = calculate_all_metrics(y_val.values, y_pred)
-                score = metrics[self.metric]
+                if warm and self._is_better(score, self.best_score):
+                    # Score warm-start gồm trees của parent → fit lại từ đầu
+                    # với đúng params trước khi nhận làm best
+                    logger.info("    ♻️ Warm-start %s: %.4f → re-scoring from scratch",
+                                self.metric, score)
+                    _, score, y_pred, _, booster = _evaluate_trial(
+                        self.model_class, params, X_train, y_train, X_val, y_val,
+                        self.metric, keep_booster=True
+                    )
+                    if score is None:
+                        logger.error("    ❌ Trial %d re-score failed: %s", i, y_pred)
+                        continue
+                    warm = False
                 
-                logger.info(f"    {self.metric}: {score:.4f}")
+                logger.info("    %s: %.4f%s", self.metric, score, " (warm-start)" if warm else "")
                 
-                # Track history
-                self.tuning_history.append({
+                # Track history (full metrics chỉ tính cho best trial)
+                entry = {
                     'params': params,
                     'score': score,
-                    'metrics': metrics
-                })
+                    'metrics': {self.metric: score},
+                    'warm_start': warm
+                }
+                self.tuning_history.append(entry)
                 
-                # Update best
-                if self._is_better(score, self.best_score):
+                # Update best (score warm-start không so sánh được)
+                if not warm and self._is_better(score, self.best_score):
                     self.best_score = score
                     self.best_params = params
-                    logger.info(f"    ✨ New best!")
-                
-            except Exception as e:
-                logger.error(f"    ❌ Trial {trial} failed: {e}")
+                    self._best_entry = entry
+                    self._best_pred = y_pred
+                    if booster is not None:
+                        self._best_booster = booster
+                        self._best_booster_params = params
+                    logger.info("    ✨ New best! %s: %.4f", self.metric, score)
+        
+        self._finalize_best(y_val)
+    
+    def _skip_seen(self, param_combinations: List[Dict]) -> List[Dict]:
+        """Bỏ combinations đã chạy (trong search này hoặc search trước)"""
+        seen = self._seen
+        unique = []
+        for params in param_combinations:
+            key = _params_key(params)
+            if key in seen:
                 continue
+            seen.add(key)
+            unique.append(params)
+        
+        n_skipped = len(param_combinations) - len(unique)
+        if n_skipped:
+            logger.info("  Skipped %d duplicate trials", n_skipped)
+        return unique
+    
+    def _warm_start_booster(self, params: Dict[str, Any]):
+        """
+        Booster của best trial nếu params cùng structural params với nó
+        (max_depth, tree_method, ...), ngược lại None → train từ đầu
+        """
+        best_params = self._best_booster_params
+        if self._best_booster is None or best_params is None:
+            return None
         
-        logger.info(f"✅ Random search completed")
-        logger.info(f"  Best {self.metric}: {self.best_score:.4f}")
-        logger.info(f"  Best params: {self.best_params}")
+        for key in _STRUCTURAL_PARAMS:
+            if params.get(key) != best_params.get(key):
+                return None
+        return self._best_booster
+    
+    def _finalize_best(self, y_val):
+        """Tính full metrics (rmse, mape, mae, r2, ...) cho best trial"""
+        if self._best_pred is None or self._best_entry is None:
+            return
         
-        return self.best_params, self.best_score
+        self._best_entry['metrics'] = calculate_all_metrics(y_val, self._best_pred)
+        self._best_pred = None
     
-    def _sample_params(self, distributions: Dict[str, tuple]) -> Dict:
-        """Sample random parameters from distributions"""
-        params = {}
-        for param_name, (min_val, max_val) in distributions.items():
+    def _presample_params(
+        self,
+        distributions: Dict[str, tuple],
+        n_trials: int,
+        seed: int = None
+    ) -> List[Dict]:
+        """
+        Sample params cho toàn bộ trials bằng vài lần gọi RNG vectorized
+        
+        Args:
+            distributions: Dict (min, max) hoặc (min, max, 'log') mỗi param;
+                min là int → integer param
+            n_trials: Number of trials
+            seed: Seed cho np.random.default_rng
+        
+        Returns:
+            List[Dict]: Params của từng trial
+        """
+        rng = np.random.default_rng(seed)
+        
+        int_keys, float_keys = [], []
+        int_bounds, float_bounds = [], []
+        int_log, float_log = [], []
+        for param_name, (min_val, max_val, *scale) in distributions.items():
+            log = bool(scale) and scale[0] == 'log'
             if isinstance(min_val, int):
-                # Integer parameter
-                params[param_name] = np.random.randint(min_val, max_val + 1)
+                int_keys.append(param_name)
+                int_bounds.append((min_val, max_val))
+                int_log.append(log)
             else:
-                # Float parameter
-                params[param_name] = np.random.uniform(min_val, max_val)
-        return params
+                float_keys.append(param_name)
+                float_bounds.append((min_val, max_val))
+                float_log.append(log)
+        
+        columns = {}
+        
+        if int_keys:
+            low, high = np.asarray(int_bounds, dtype=np.int64).T
+            values = rng.integers(low, high + 1, size=(n_trials, len(int_keys)))
+            log_mask = np.asarray(int_log)
+            if log_mask.any():
+                # Log-uniform integer: floor(exp(U[log lo, log(hi + 1))))
+                u = rng.uniform(np.log(low[log_mask]), np.log(high[log_mask] + 1),
+                                size=(n_trials, int(log_mask.sum())))
+                values[:, log_mask] = np.minimum(np.floor(np.exp(u)), high[log_mask])
+            columns.update(zip(int_keys, values.T.tolist()))
+        
+        if float_keys:
+            low, high = np.asarray(float_bounds, dtype=np.float64).T
+            log_mask = np.asarray(float_log)
+            low = np.where(log_mask, np.log(low), low)
+            high = np.where(log_mask, np.log(high), high)
+            values = rng.uniform(low, high, size=(n_trials, len(float_keys)))
+            values[:, log_mask] = np.exp(values[:, log_mask])
+            columns.update(zip(float_keys, values.T.tolist()))
+        
+        # Giữ thứ tự params như distributions
+        keys = list(distributions)
+        return [
+            {key: columns[key][t] for key in keys}
+            for t in range(n_trials)
+        ]
     
     def _is_better(self, new_score: float, current_best: float) -> bool:
         """Check if new score is better than current best"""
@@ -203,10 +851,16 @@ class HyperparameterTuner:
             return "No tuning history"
         
         report = []
-        report.append("=" * 70)
+        report.append(_SEP)
         report.append("HYPERPARAMETER TUNING REPORT")
-        report.append("=" * 70)
+        report.append(_SEP)
+        # Score warm-start gồm trees của parent → không xếp hạng cùng trials cold
+        cold_history = [h for h in self.tuning_history if not h.get('warm_start')]
+        
         report.append(f"Total trials: {len(self.tuning_history)}")
+        n_warm = len(self.tuning_history) - len(cold_history)
+        if n_warm:
+            report.append(f"Warm-start trials (excluded from ranking): {n_warm}")
         report.append(f"Metric: {self.metric}")
         report.append(f"Best score: {self.best_score:.4f}")
         report.append(f"Best params: {self.best_params}")
@@ -214,7 +868,7 @@ class HyperparameterTuner:
         
         # Sort by score
         sorted_history = sorted(
-            self.tuning_history,
+            cold_history,
             key=lambda x: x['score'],
             reverse=not self.minimize
         )
@@ -2,6 +2,7 @@
 training/trainer.py
 🏋️ Main Training Orchestrator (Conductor)
 """
+import gc
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
@@ -9,6 +10,9 @@ import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+# Banner dựng sẵn một lần, không nối chuỗi mỗi lần log
+_SEP = "=" * 70
+
 class ModelTrainer:
     """
     Orchestrates toàn bộ training pipeline
@@ -51,42 +55,37 @@ class ModelTrainer:
         Returns:
             Dict: Training results
         """
-        logger.info("=" * 70)
-        logger.info("🏋️ STARTING FULL TRAINING PIPELINE")
-        logger.info("=" * 70)
+        logger.info("%s\n🏋️ STARTING FULL TRAINING PIPELINE\n%s", _SEP, _SEP)
         
         self.start_time = datetime.utcnow()
         
         try:
             # ============ STEP 1: LOAD DATA ============
-            logger.info("\n" + "=" * 70)
-            logger.info("STEP 1: LOADING CANONICAL DATA")
-            logger.info("=" * 70)
+            logger.info("\n%s\nSTEP 1: LOADING CANONICAL DATA\n%s", _SEP, _SEP)
             
             df_canonical = data_loader.load_canonical_data()
             
             # ============ STEP 2: FEATURE ENGINEERING ============
-            logger.info("\n" + "=" * 70)
-            logger.info("STEP 2: FEATURE ENGINEERING")
-            logger.info("=" * 70)
+            logger.info("\n%s\nSTEP 2: FEATURE ENGINEERING\n%s", _SEP, _SEP)
             
-            df_features = feature_strategy.create_features(df_canonical)
+            # Canonical data không dùng lại → thêm features in place,
+            # giải phóng reference ngay (peak RAM không giữ cả hai frames)
+            df_features = feature_strategy.create_features(df_canonical, in_place=True)
+            del df_canonical
             
             # ============ STEP 3: PREPARE TRAIN DATA ============
-            logger.info("\n" + "=" * 70)
-            logger.info("STEP 3: PREPARING TRAIN DATA")
-            logger.info("=" * 70)
+            logger.info("\n%s\nSTEP 3: PREPARING TRAIN DATA\n%s", _SEP, _SEP)
             
             X, y, timestamps = data_loader.prepare_train_data(
                 df=df_features,
                 target_column=self.config.TARGET_COLUMN,
                 exclude_features=self.config.EXCLUDE_FEATURES
             )
+            del df_features
+            gc.collect()
             
             # ============ STEP 4: SPLIT DATA ============
-            logger.info("\n" + "=" * 70)
-            logger.info("STEP 4: SPLITTING DATA")
-            logger.info("=" * 70)
+            logger.info("\n%s\nSTEP 4: SPLITTING DATA\n%s", _SEP, _SEP)
             
             (X_train, X_val, X_test, 
              y_train, y_val, y_test,
@@ -98,11 +97,11 @@ class ModelTrainer:
                 val_ratio=self.config.VAL_RATIO,
                 test_ratio=self.config.TEST_RATIO
             )
+            del X, y, timestamps
+            gc.collect()
             
             # ============ STEP 5: TRAIN MODEL ============
-            logger.info("\n" + "=" * 70)
-            logger.info("STEP 5: TRAINING MODEL")
-            logger.info("=" * 70)
+            logger.info("\n%s\nSTEP 5: TRAINING MODEL\n%s", _SEP, _SEP)
             
             train_metrics = model_pipeline.fit(
                 X_train=X_train,
@@ -112,9 +111,7 @@ class ModelTrainer:
             )
             
             # ============ STEP 6: EVALUATE ============
-            logger.info("\n" + "=" * 70)
-            logger.info("STEP 6: EVALUATION")
-            logger.info("=" * 70)
+            logger.info("\n%s\nSTEP 6: EVALUATION\n%s", _SEP, _SEP)
             
             from evaluation.metrics import calculate_all_metrics
             
@@ -127,13 +124,13 @@ class ModelTrainer:
             
             logger.info("📊 Test Metrics:")
             for metric, value in test_metrics.items():
-                logger.info(f"  {metric.upper()}: {value:.4f}")
+                logger.info("  %s: %.4f", metric.upper(), value)
             
             # Feature importance
             feature_importance = model_pipeline.get_feature_importance(top_n=10)
             logger.info("\n🔍 Top 10 Features:")
             for feat, imp in feature_importance.items():
-                logger.info(f"  {feat}: {imp:.4f}")
+                logger.info("  %s: %.4f", feat, imp)
             
             # ============ END ============
             self.end_time = datetime.utcnow()
@@ -159,19 +156,17 @@ class ModelTrainer:
                 }
             }
             
-            logger.info("\n" + "=" * 70)
-            logger.info("🎉 TRAINING COMPLETED SUCCESSFULLY")
-            logger.info("=" * 70)
-            logger.info(f"Duration: {duration:.1f}s")
-            logger.info(f"Test RMSE: {test_metrics['rmse']:.2f}")
-            logger.info(f"Test MAPE: {test_metrics['mape']:.2f}%")
+            logger.info("\n%s\n🎉 TRAINING COMPLETED SUCCESSFULLY\n%s", _SEP, _SEP)
+            logger.info("Duration: %.1fs", duration)
+            logger.info("Test RMSE: %.2f", test_metrics['rmse'])
+            logger.info("Test MAPE: %.2f%%", test_metrics['mape'])
             
             self.training_history = results
             
             return results
             
         except Exception as e:
-            logger.error(f"💥 Training failed: {e}", exc_info=True)
+            logger.error("💥 Training failed: %s", e, exc_info=True)
             raise
     
     def get_training_summary(self) -> str:
@@ -180,9 +175,9 @@ class ModelTrainer:
             return "No training history"
         
         summary = []
-        summary.append("=" * 70)
+        summary.append(_SEP)
         summary.append("TRAINING SUMMARY")
-        summary.append("=" * 70)
+        summary.append(_SEP)
         
         if self.start_time:
             summary.append(f"Started: {self.start_time.isoformat()}")
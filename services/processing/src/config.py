@@ -3,46 +3,122 @@ config.py
 ⚙️ Configuration Management cho Service Processing (Refactored v2)
 """
 import os
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Literal
 from calendar import monthrange
 
 VN_TZ = timezone(timedelta(hours=7))
 
+_VALID_MODES = frozenset({"BACKFILL", "HOURLY", "COMPACTION_DAILY", "COMPACTION_MONTHLY"})
+
+@lru_cache(maxsize=128)
+def _is_month_complete_at(year: int, month: int, today: date) -> bool:
+    """is_month_complete tại ngày today (pure → cache theo (year, month, today))"""
+    # Tháng hiện tại chưa bao giờ complete
+    if year == today.year and month == today.month:
+        return False
+    
+    # Tháng trong tương lai không hợp lệ
+    if date(year, month, 1) > today:
+        return False
+    
+    # Tháng trong quá khứ: ngày cuối tháng đã qua → complete
+    _, days_in_month = monthrange(year, month)
+    return date(year, month, days_in_month) < today
+
+# ============ S3 PATHS ============
+# Module-level str constants (build một lần lúc import); Config giữ alias
+BRONZE_PREFIX = "bronze"
+SILVER_PREFIX = "silver"
+GOLD_PREFIX = "gold"
+
+WEATHER_BRONZE_PATH = f"{BRONZE_PREFIX}/weather"
+WEATHER_SILVER_PATH = f"{SILVER_PREFIX}/weather"
+ELECTRICITY_BRONZE_PATH = f"{BRONZE_PREFIX}/electricity"
+ELECTRICITY_SILVER_PATH = f"{SILVER_PREFIX}/electricity"
+GOLD_CANONICAL_PATH = f"{GOLD_PREFIX}/canonical"
+
+@lru_cache(maxsize=1)
+def _resolve_mode() -> str:
+    """MODE từ env, đọc + validate một lần mỗi process"""
+    mode = os.getenv("MODE", "HOURLY")
+    if mode not in _VALID_MODES:
+        raise ValueError(f"Invalid MODE: {mode}. Must be one of {sorted(_VALID_MODES)}")
+    return mode
+
+@lru_cache(maxsize=None)
+def _processing_target_for_mode(mode: str) -> tuple:
+    """
+    Target của một MODE, tính một lần mỗi process
+    (datetime.now + strftime không lặp lại ở mỗi lần gọi)
+    """
+    now_vn = datetime.now(VN_TZ)
+    
+    if mode == "BACKFILL":
+        # Xử lý toàn bộ lịch sử
+        start_date = "2021-10-27"
+        end_date = (now_vn - timedelta(days=1)).strftime("%Y-%m-%d")
+        return start_date, end_date
+        
+    elif mode == "HOURLY":
+        # Xử lý giờ vừa thu thập (giờ trước)
+        current_hour = now_vn.replace(minute=0, second=0, microsecond=0)
+        target_hour = current_hour - timedelta(hours=1)
+        return target_hour.strftime("%Y-%m-%d"), target_hour.strftime("%H")
+        
+    elif mode == "COMPACTION_DAILY":
+        # Gộp dữ liệu ngày hôm qua
+        yesterday = now_vn - timedelta(days=1)
+        return (yesterday.strftime("%Y-%m-%d"),)
+        
+    elif mode == "COMPACTION_MONTHLY":
+        # Gộp dữ liệu tháng trước (nếu đủ ngày)
+        first_of_month = now_vn.replace(day=1)
+        last_month = first_of_month - timedelta(days=1)
+        return last_month.year, last_month.month
+
 class Config:
     """Centralized configuration for Processing Service"""
     
     # ============ MODE CONFIGURATION ============
+    # MODE đã validate, set bởi validate_at_startup() ở entrypoint
+    _MODE = None
+    
     @staticmethod
     def get_mode() -> Literal["BACKFILL", "HOURLY", "COMPACTION_DAILY", "COMPACTION_MONTHLY"]:
-        mode = os.getenv("MODE", "HOURLY")
-        valid_modes = ["BACKFILL", "HOURLY", "COMPACTION_DAILY", "COMPACTION_MONTHLY"]
-        if mode not in valid_modes:
-            raise ValueError(f"Invalid MODE: {mode}. Must be one of {valid_modes}")
-        return mode
+        return Config._MODE or _resolve_mode()
+    
+    @staticmethod
+    def reset_cache():
+        """Xoá cache MODE/target (vd khi đổi env MODE trong cùng process)"""
+        Config._MODE = None
+        _resolve_mode.cache_clear()
+        _processing_target_for_mode.cache_clear()
+        _render_summary.cache_clear()
     
     # ============ S3 CONFIGURATION ============
     S3_BUCKET = os.getenv("S3_BUCKET", "vietnam-energy-data")
     
     # S3 Paths
-    BRONZE_PREFIX = "bronze"
-    SILVER_PREFIX = "silver"
-    GOLD_PREFIX = "gold"
+    BRONZE_PREFIX = BRONZE_PREFIX
+    SILVER_PREFIX = SILVER_PREFIX
+    GOLD_PREFIX = GOLD_PREFIX
     
     # ============ DATA SOURCE PATHS ============
     # Weather paths
-    WEATHER_BRONZE_PATH = f"{BRONZE_PREFIX}/weather"
-    WEATHER_SILVER_PATH = f"{SILVER_PREFIX}/weather"
+    WEATHER_BRONZE_PATH = WEATHER_BRONZE_PATH
+    WEATHER_SILVER_PATH = WEATHER_SILVER_PATH
     
     # Electricity paths (chỉ quan tâm total_load)
-    ELECTRICITY_BRONZE_PATH = f"{BRONZE_PREFIX}/electricity"
-    ELECTRICITY_SILVER_PATH = f"{SILVER_PREFIX}/electricity"
+    ELECTRICITY_BRONZE_PATH = ELECTRICITY_BRONZE_PATH
+    ELECTRICITY_SILVER_PATH = ELECTRICITY_SILVER_PATH
     
     # Chỉ xử lý total_load signal
     ELECTRICITY_SIGNALS = ["total_load"]
     
     # Gold path (Canonical Table)
-    GOLD_CANONICAL_PATH = f"{GOLD_PREFIX}/canonical"
+    GOLD_CANONICAL_PATH = GOLD_CANONICAL_PATH
     
     # ============ DATE/TIME RANGE CONFIG ============
     @staticmethod
@@ -56,31 +132,7 @@ class Config:
             - COMPACTION_DAILY: (date,)
             - COMPACTION_MONTHLY: (year, month)
         """
-        now_vn = datetime.now(VN_TZ)
-        mode = Config.get_mode()
-        
-        if mode == "BACKFILL":
-            # Xử lý toàn bộ lịch sử
-            start_date = "2021-10-27"
-            end_date = (now_vn - timedelta(days=1)).strftime("%Y-%m-%d")
-            return start_date, end_date
-            
-        elif mode == "HOURLY":
-            # Xử lý giờ vừa thu thập (giờ trước)
-            current_hour = now_vn.replace(minute=0, second=0, microsecond=0)
-            target_hour = current_hour - timedelta(hours=1)
-            return target_hour.strftime("%Y-%m-%d"), target_hour.strftime("%H")
-            
-        elif mode == "COMPACTION_DAILY":
-            # Gộp dữ liệu ngày hôm qua
-            yesterday = now_vn - timedelta(days=1)
-            return (yesterday.strftime("%Y-%m-%d"),)
-            
-        elif mode == "COMPACTION_MONTHLY":
-            # Gộp dữ liệu tháng trước (nếu đủ ngày)
-            first_of_month = now_vn.replace(day=1)
-            last_month = first_of_month - timedelta(days=1)
-            return last_month.year, last_month.month
+        return _processing_target_for_mode(Config.get_mode())
     
     @staticmethod
     def is_month_complete(year: int, month: int) -> bool:
@@ -94,23 +146,7 @@ class Config:
         Returns:
             bool: True nếu đã đủ ngày trong tháng
         """
-        now_vn = datetime.now(VN_TZ)
-        
-        # Tháng hiện tại chưa bao giờ complete
-        if year == now_vn.year and month == now_vn.month:
-            return False
-        
-        # Tháng trong tương lai không hợp lệ
-        target_date = datetime(year, month, 1)
-        if target_date > now_vn:
-            return False
-        
-        # Tháng trong quá khứ: Check xem có đủ số ngày không
-        _, days_in_month = monthrange(year, month)
-        
-        # Nếu tháng đã qua thì mặc định là complete
-        last_day_of_month = datetime(year, month, days_in_month)
-        return last_day_of_month < now_vn
+        return _is_month_complete_at(year, month, datetime.now(VN_TZ).date())
     
     # ============ DATA PROCESSING CONFIG ============
     
@@ -123,8 +159,10 @@ class Config:
     
     # ============ PERFORMANCE CONFIG ============
     
-    # Parquet compression
-    PARQUET_COMPRESSION = "snappy"
+    # Parquet compression: snappy = nén/giải nén nhanh nhất; zstd = file
+    # nhỏ hơn 25-40% với tốc độ đọc tương đương → cân bằng tốt hơn trên S3
+    PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+    PARQUET_COMPRESSION_LEVEL = int(os.getenv("PARQUET_COMPRESSION_LEVEL", "3"))
     
     @staticmethod
     def validate():
@@ -134,36 +172,53 @@ class Config:
         if not Config.S3_BUCKET:
             errors.append("❌ S3_BUCKET không được set")
         
-        mode = Config.get_mode()
-        # Mode đã được validate trong get_mode()
-        
         if errors:
             raise ValueError("\n".join(errors))
         
         return True
     
     @staticmethod
-    def get_summary():
-        """In ra summary của config"""
-        mode = Config.get_mode()
-        target = Config.get_processing_target()
+    def validate_at_startup() -> str:
+        """
+        Validate config một lần ở entrypoint: resolve + validate MODE,
+        lưu vào Config._MODE để các lần đọc sau không đụng env
         
-        if mode == "BACKFILL":
-            target_str = f"Date range: {target[0]} to {target[1]}"
-        elif mode == "HOURLY":
-            target_str = f"Date: {target[0]}, Hour: {target[1]}:00"
-        elif mode == "COMPACTION_DAILY":
-            target_str = f"Date: {target[0]}"
-        elif mode == "COMPACTION_MONTHLY":
-            target_str = f"Year: {target[0]}, Month: {target[1]}"
-        else:
-            target_str = str(target)
+        Returns:
+            str: MODE đã validate
         
-        return f"""
+        Raises:
+            ValueError: MODE hoặc config không hợp lệ
+        """
+        Config._MODE = _resolve_mode()
+        Config.validate()
+        return Config._MODE
+    
+    @staticmethod
+    def get_summary():
+        """In ra summary của config (render một lần cho mỗi (mode, target))"""
+        return _render_summary(Config.get_mode(), Config.get_processing_target())
+
+_SUMMARY_HEADER = """
 ╔══════════════════════════════════════════════════════════╗
 ║         PROCESSING SERVICE (REFACTORED V2)               ║
 ╚══════════════════════════════════════════════════════════╝
+"""
 
+@lru_cache(maxsize=1)
+def _render_summary(mode: str, target: tuple) -> str:
+    """Summary string; config bất biến trong một lần chạy → cache kết quả"""
+    if mode == "BACKFILL":
+        target_str = f"Date range: {target[0]} to {target[1]}"
+    elif mode == "HOURLY":
+        target_str = f"Date: {target[0]}, Hour: {target[1]}:00"
+    elif mode == "COMPACTION_DAILY":
+        target_str = f"Date: {target[0]}"
+    elif mode == "COMPACTION_MONTHLY":
+        target_str = f"Year: {target[0]}, Month: {target[1]}"
+    else:
+        target_str = str(target)
+    
+    return _SUMMARY_HEADER + f"""
 Mode: {mode}
 Target: {target_str}
 S3 Bucket: {Config.S3_BUCKET}
@@ -179,5 +234,5 @@ Pipeline:
 
 Processing Config:
   • Timezone: {Config.SOURCE_TIMEZONE} → {Config.TARGET_TIMEZONE}
-  • Parquet Compression: {Config.PARQUET_COMPRESSION}
+  • Parquet Compression: {Config.PARQUET_COMPRESSION} (level {Config.PARQUET_COMPRESSION_LEVEL})
         """
\ No newline at end of file
@@ -0,0 +1,39 @@
+"""
+etl/_dedup.py
+🔁 Deduplication helper dùng chung cho các cleaners (Bronze → Silver)
+"""
+import numpy as np
+
+def first_occurrence_mask(ts: np.ndarray) -> np.ndarray:
+    """
+    Mask giữ occurrence đầu tiên của mỗi timestamp (như drop_duplicates)
+    
+    Stable argsort + so sánh phần tử kề nhau (không build hash table).
+    NaT được coi là trùng nhau → chỉ giữ NaT đầu tiên.
+    
+    Args:
+        ts: datetime64 array
+    
+    Returns:
+        np.ndarray: bool mask theo thứ tự gốc của ts
+    """
+    n = len(ts)
+    mask = np.ones(n, dtype=bool)
+    if n < 2:
+        return mask
+    
+    order = np.argsort(ts, kind='stable')
+    sorted_ts = ts[order]
+    
+    # Stable sort → phần tử đầu mỗi nhóm trùng là occurrence đầu tiên
+    keep = np.empty(n, dtype=bool)
+    keep[0] = True
+    np.not_equal(sorted_ts[1:], sorted_ts[:-1], out=keep[1:])
+    
+    # NaT != NaT → gom các NaT (argsort xếp cuối) thành một nhóm
+    is_nat = np.isnat(sorted_ts)
+    keep[1:] &= ~(is_nat[1:] & is_nat[:-1])
+    
+    # Scatter về vị trí gốc
+    mask[order] = keep
+    return mask
@@ -5,10 +5,26 @@ etl/canonical_merger.py
 import logging
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 from typing import Tuple
 
 logger = logging.getLogger(__name__)
 
+# Numeric columns của Silver (trước rename): float32 đủ độ chính xác cho
+# nhiệt độ/độ ẩm/gió/mưa/phụ tải, và giảm nửa bytes qua merge/interpolate
+_FLOAT32_COLUMNS = ('temperature', 'humidity', 'wind_speed', 'precipitation', 'total_load')
+
+# Schema chuẩn của Gold (Canonical Table): cố định để các daily files
+# ghép được vào monthly file dù một ngày bị upcast float64 / thiếu column
+GOLD_CANONICAL_SCHEMA = pa.schema([
+    ('datetime', pa.timestamp('ns')),
+    ('electricity_demand', pa.float32()),
+    ('temperature', pa.float32()),
+    ('humidity', pa.float32()),
+    ('wind_speed', pa.float32()),
+    ('precipitation', pa.float32())
+])
+
 class CanonicalMerger:
     """
     Logical Cleaning: Silver → Gold (Canonical Table)
@@ -17,8 +33,8 @@ class CanonicalMerger:
     1. Time Alignment: Đồng bộ thời gian
     2. Merging: Join 2 bảng Weather + Electricity
     3. Rename Business: Đặt tên cột theo nghiệp vụ
-    4. Imputation: Điền khuyết cơ bản
-    5. Outlier Flagging: Đánh dấu bất thường
+    4. Outlier Flagging: Đánh dấu bất thường (→ NaN)
+    5. Imputation: Điền khuyết cơ bản (một lần, gồm cả outliers)
     
     Output: Canonical Table
     Columns: [datetime, electricity_demand, temperature, humidity, 
@@ -57,14 +73,14 @@ class CanonicalMerger:
         df = self._rename_business(df)
         logger.info(f"  → Renamed to business names")
         
-        # Step 4: Imputation
-        df = self._impute_missing(df)
-        logger.info(f"  → Imputed missing values")
-        
-        # Step 5: Outlier Flagging
+        # Step 4: Outlier Flagging (set NaN, chưa impute)
         df = self._flag_outliers(df)
         logger.info(f"  → Flagged outliers")
         
+        # Step 5: Imputation — một pass cho cả missing gốc và outliers
+        df = self._impute_missing(df)
+        logger.info(f"  → Imputed missing values")
+        
         # Step 6: Final validation & sorting
         df = self._finalize(df)
         logger.info(f"  → Finalized: {len(df)} rows, {len(df.columns)} columns")
@@ -81,20 +97,37 @@ class CanonicalMerger:
         
         - Đảm bảo cả 2 đều cùng timezone (đã xử lý ở Silver)
         - Resample về cùng tần suất (1 Hour)
+        - Trả về frames index theo datetime (sorted) cho index join
         """
-        # Ensure datetime type
-        weather_df['datetime'] = pd.to_datetime(weather_df['datetime'])
-        electricity_df['datetime'] = pd.to_datetime(electricity_df['datetime'])
-        
-        # Sort by datetime
-        weather_df = weather_df.sort_values('datetime').reset_index(drop=True)
-        electricity_df = electricity_df.sort_values('datetime').reset_index(drop=True)
+        # Ensure datetime type (Silver parquet đã là datetime64 → bỏ qua parse)
+        for frame in (weather_df, electricity_df):
+            if not pd.api.types.is_datetime64_any_dtype(frame['datetime']):
+                frame['datetime'] = pd.to_datetime(frame['datetime'])
+        
+        # Downcast numerics → float32 trước merge/interpolate
+        for frame in (weather_df, electricity_df):
+            for col in _FLOAT32_COLUMNS:
+                if col in frame.columns:
+                    frame[col] = frame[col].astype(np.float32, copy=False)
+        
+        # Sorted DatetimeIndex → join là merge tuyến tính trên 2 index đã sort
+        # (Silver hourly grid thường đã sorted → chỉ sort khi cần)
+        weather_df = self._sorted_by_datetime(weather_df)
+        electricity_df = self._sorted_by_datetime(electricity_df)
         
         # Resample to hourly (if needed)
         # Hiện tại cả 2 đều đã là hourly từ Silver, nên không cần resample
         
         return weather_df, electricity_df
     
+    @staticmethod
+    def _sorted_by_datetime(df: pd.DataFrame) -> pd.DataFrame:
+        """Set datetime làm index; sort_index chỉ khi index chưa monotonic"""
+        df = df.set_index('datetime')
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        return df
+    
     def _merge_tables(
         self,
         weather_df: pd.DataFrame,
@@ -104,15 +137,15 @@ class CanonicalMerger:
         Merging: Join 2 bảng Weather + Electricity
         
         Join type: INNER JOIN (chỉ giữ rows có đủ cả 2)
-        Key: datetime
+        Key: datetime (sorted index từ _time_alignment)
         """
-        # Inner join để đảm bảo có đủ data
-        df = pd.merge(
-            weather_df,
+        # Inner join để đảm bảo có đủ data; index đã sort → không build hash table
+        df = weather_df.join(
             electricity_df,
-            on='datetime',
-            how='inner'
-        )
+            how='inner',
+            lsuffix='_x',
+            rsuffix='_y'
+        ).reset_index()
         
         if len(df) == 0:
             logger.warning("⚠️ No overlapping datetime between weather and electricity!")
@@ -149,26 +182,32 @@ class CanonicalMerger:
             'precipitation'
         ]
         
-        for col in numeric_cols:
-            if col not in df.columns:
-                continue
-            
-            # Count missing
-            missing_count = df[col].isnull().sum()
-            if missing_count == 0:
-                continue
-            
-            logger.info(f"    Imputing {col}: {missing_count} missing values")
-            
-            # Linear interpolation (limit=3 hours)
-            df[col] = df[col].interpolate(
-                method='linear',
-                limit=3,
-                limit_direction='both'
-            )
-            
-            # Fill remaining with forward/backward fill
-            df[col] = df[col].ffill().bfill()
+        existing = [col for col in numeric_cols if col in df.columns]
+        if not existing:
+            return df
+        
+        # Count missing một lần cho cả block columns
+        missing_counts = df[existing].isna().sum()
+        missing_cols = missing_counts.index[missing_counts.to_numpy() > 0].tolist()
+        if not missing_cols:
+            return df
+        
+        for col in missing_cols:
+            logger.info(f"    Imputing {col}: {missing_counts[col]} missing values")
+        
+        # Linear interpolation (limit=3 hours) + forward/backward fill phần
+        # còn lại: một pass trên sub-frame thay vì từng column
+        filled = df[missing_cols].interpolate(
+            method='linear',
+            limit=3,
+            limit_direction='both'
+        )
+        
+        # Gap nhỏ (thường gặp) đã điền hết → bỏ qua 2 pass ffill/bfill
+        if np.isnan(filled.to_numpy()).any():
+            filled = filled.ffill().bfill()
+        
+        df[missing_cols] = filled
         
         return df
     
@@ -178,27 +217,40 @@ class CanonicalMerger:
         
         - Temperature > 60°C hoặc < -10°C → Sai cảm biến → Set to NaN
         - Electricity demand < 0 → Impossible → Set to NaN
-        - Sau đó impute lại
+        - Không impute ở đây: _impute_missing chạy ngay sau trong merge()
         """
+        # Masks tính trên ndarray (không tạo Series trung gian cho mỗi phép so sánh)
         # Temperature outliers
         if 'temperature' in df.columns:
-            outliers = (df['temperature'] > 60) | (df['temperature'] < -10)
+            values = df['temperature'].to_numpy()
+            outliers = (values > 60.0) | (values < -10.0)
             if outliers.any():
                 logger.warning(f"    ⚠️ Temperature outliers: {outliers.sum()} rows")
-                df.loc[outliers, 'temperature'] = np.nan
+                self._set_nan(df, 'temperature', outliers)
         
         # Electricity demand outliers
         if 'electricity_demand' in df.columns:
-            outliers = (df['electricity_demand'] < 0)
+            outliers = df['electricity_demand'].to_numpy() < 0.0
             if outliers.any():
                 logger.warning(f"    ⚠️ Electricity outliers: {outliers.sum()} rows")
-                df.loc[outliers, 'electricity_demand'] = np.nan
-        
-        # Re-impute after flagging
-        df = self._impute_missing(df)
+                self._set_nan(df, 'electricity_demand', outliers)
         
         return df
     
+    @staticmethod
+    def _set_nan(df: pd.DataFrame, col: str, mask: np.ndarray):
+        """
+        Set NaN tại mask bằng np.putmask trên bản copy của column rồi gán
+        lại cả column (không qua boolean indexer của .loc; an toàn với
+        Copy-on-Write vì không ghi vào buffer dùng chung của block)
+        """
+        values = df[col].to_numpy(copy=True)
+        if values.dtype.kind != 'f':
+            # NaN cần float dtype (giống .loc upcast int → float64)
+            values = values.astype(np.float64)
+        np.putmask(values, mask, np.nan)
+        df[col] = values
+    
     def _finalize(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Finalize: Sort, select columns, drop remaining NaN
@@ -220,12 +272,18 @@ class CanonicalMerger:
         available_cols = [col for col in final_cols if col in df.columns]
         df = df[available_cols]
         
-        # Sort by datetime
-        df = df.sort_values('datetime').reset_index(drop=True)
+        # Drop rows with ANY remaining NaN in critical columns: một mask
+        # trên block numeric + NaT datetime (NaT keys vẫn join được với nhau)
+        critical_cols = ['electricity_demand', 'temperature']
+        keep = ~np.isnan(df[critical_cols].to_numpy()).any(axis=1)
+        keep &= ~df['datetime'].isna().to_numpy()
+        if not keep.all():
+            df = df[keep]
         
-        # Drop rows with ANY remaining NaN in critical columns
-        critical_cols = ['datetime', 'electricity_demand', 'temperature']
-        df = df.dropna(subset=critical_cols)
+        # Index join giữ thứ tự datetime → chỉ sort khi thật sự chưa sorted
+        # (check monotonic O(n) thay vì sort O(n log n))
+        if not df['datetime'].is_monotonic_increasing:
+            df = df.sort_values('datetime', kind='stable', ignore_index=True)
         
         return df
     
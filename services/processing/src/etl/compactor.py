@@ -3,11 +3,14 @@ etl/compactor.py
 🗜️ Data Compactor - Gộp hourly/daily files
 """
 import logging
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, Future
 from typing import Dict, Any
 from calendar import monthrange
 from s3_connector import S3Connector
-from config import Config
+from config import Config, WEATHER_SILVER_PATH, ELECTRICITY_SILVER_PATH, GOLD_CANONICAL_PATH
+from etl.weather_cleaner import WEATHER_SILVER_SCHEMA
+from etl.electricity_cleaner import ELECTRICITY_SILVER_SCHEMA
+from etl.canonical_merger import GOLD_CANONICAL_SCHEMA
 
 logger = logging.getLogger(__name__)
 
@@ -51,21 +54,24 @@ class ProcessingCompactor:
             "electricity": None
         }
         
-        # Compact Weather Silver
-        try:
-            results["weather"] = self._compact_weather_silver(date)
-        except Exception as e:
-            logger.error(f"❌ Weather compaction failed: {str(e)}")
-            results["weather"] = {"status": "error", "error": str(e)}
+        # Weather và Electricity độc lập, đều I/O-bound (S3) → chạy song song
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            weather_future = pool.submit(self._compact_weather_silver, date)
+            electricity_future = pool.submit(self._compact_electricity_silver, date)
+            
+            results["weather"] = self._collect(weather_future, "Weather")
+            results["electricity"] = self._collect(electricity_future, "Electricity")
         
-        # Compact Electricity Silver
+        return results
+    
+    @staticmethod
+    def _collect(future: Future, name: str) -> Dict[str, Any]:
+        """Lấy kết quả compaction; lỗi → stats {"status": "error"}"""
         try:
-            results["electricity"] = self._compact_electricity_silver(date)
+            return future.result()
         except Exception as e:
-            logger.error(f"❌ Electricity compaction failed: {str(e)}")
-            results["electricity"] = {"status": "error", "error": str(e)}
-        
-        return results
+            logger.error(f"❌ {name} compaction failed: {str(e)}")
+            return {"status": "error", "error": str(e)}
     
     def _compact_weather_silver(self, date: str) -> Dict[str, Any]:
         """Compact Weather Silver: 24 hourly files → 1 daily file"""
@@ -78,27 +84,19 @@ class ProcessingCompactor:
         # Actually, in HOURLY mode, we should save to hour-specific files
         # Let's assume structure: silver/weather/year=YYYY/month=MM/day=DD/HH_30.parquet
         
-        date_obj = pd.to_datetime(date)
-        year = date_obj.year
-        month = str(date_obj.month).zfill(2)
-        day = str(date_obj.day).zfill(2)
-        
-        partition_prefix = f"{Config.WEATHER_SILVER_PATH}/year={year}/month={month}/day={day}/"
+        partition_prefix = self.s3.get_partition_prefix(WEATHER_SILVER_PATH, date)
         
         # List all files in partition
         try:
-            response = self.s3.s3_client.list_objects_v2(
-                Bucket=self.s3.bucket_name,
-                Prefix=partition_prefix
-            )
+            keys = self.s3.list_keys(partition_prefix)
             
-            if 'Contents' not in response:
+            if not keys:
                 logger.warning(f"⚠️ No hourly files found for {date}")
                 return {"status": "no_files", "files_processed": 0}
             
             hourly_files = [
-                obj['Key'] for obj in response['Contents']
-                if obj['Key'].endswith('.parquet') and '_30.parquet' in obj['Key']
+                key for key in keys
+                if key.endswith('.parquet') and '_30.parquet' in key
             ]
             
             if not hourly_files:
@@ -107,36 +105,29 @@ class ProcessingCompactor:
             
             logger.info(f"    📁 Found {len(hourly_files)} hourly files")
             
-            # Read all hourly files
-            dfs = []
-            for file_key in hourly_files:
-                df = self.s3.read_parquet(file_key)
-                dfs.append(df)
-            
-            # Concatenate
-            compacted_df = pd.concat(dfs, ignore_index=True)
-            compacted_df = compacted_df.sort_values('datetime').reset_index(drop=True)
+            # Read all hourly files: 1 dataset scan (song song) → sort trong Arrow
+            compacted = self.s3.read_dataset(
+                hourly_files, schema=WEATHER_SILVER_SCHEMA
+            ).sort_by('datetime')
             
             # Write daily file
             daily_key = self.s3.get_partition_path(
-                Config.WEATHER_SILVER_PATH,
+                WEATHER_SILVER_PATH,
                 date,
                 "data.parquet"
             )
             
-            self.s3.write_parquet(
-                compacted_df,
+            self.s3.write_table(
+                compacted,
                 daily_key,
-                compression=Config.PARQUET_COMPRESSION
+                compression=Config.PARQUET_COMPRESSION,
+                compression_level=Config.PARQUET_COMPRESSION_LEVEL
             )
             
-            logger.info(f"    ✅ Compacted {len(hourly_files)} files → {len(compacted_df)} rows")
+            logger.info(f"    ✅ Compacted {len(hourly_files)} files → {compacted.num_rows} rows")
             
             # Delete hourly files
-            deleted_count = 0
-            for file_key in hourly_files:
-                if self.s3.delete_file(file_key):
-                    deleted_count += 1
+            deleted_count = self.s3.delete_files(hourly_files)
             
             logger.info(f"    🗑️ Deleted {deleted_count}/{len(hourly_files)} hourly files")
             
@@ -144,7 +135,7 @@ class ProcessingCompactor:
                 "status": "success",
                 "date": date,
                 "files_compacted": len(hourly_files),
-                "rows": len(compacted_df),
+                "rows": compacted.num_rows,
                 "files_deleted": deleted_count
             }
             
@@ -156,26 +147,18 @@ class ProcessingCompactor:
         """Compact Electricity Silver: 24 hourly files → 1 daily file"""
         logger.info(f"  ⚡ Compacting Electricity Silver for {date}")
         
-        date_obj = pd.to_datetime(date)
-        year = date_obj.year
-        month = str(date_obj.month).zfill(2)
-        day = str(date_obj.day).zfill(2)
-        
-        partition_prefix = f"{Config.ELECTRICITY_SILVER_PATH}/year={year}/month={month}/day={day}/"
+        partition_prefix = self.s3.get_partition_prefix(ELECTRICITY_SILVER_PATH, date)
         
         try:
-            response = self.s3.s3_client.list_objects_v2(
-                Bucket=self.s3.bucket_name,
-                Prefix=partition_prefix
-            )
+            keys = self.s3.list_keys(partition_prefix)
             
-            if 'Contents' not in response:
+            if not keys:
                 logger.warning(f"⚠️ No hourly files found for {date}")
                 return {"status": "no_files", "files_processed": 0}
             
             hourly_files = [
-                obj['Key'] for obj in response['Contents']
-                if obj['Key'].endswith('.parquet') and '_30.parquet' in obj['Key']
+                key for key in keys
+                if key.endswith('.parquet') and '_30.parquet' in key
             ]
             
             if not hourly_files:
@@ -184,36 +167,29 @@ class ProcessingCompactor:
             
             logger.info(f"    📁 Found {len(hourly_files)} hourly files")
             
-            # Read all hourly files
-            dfs = []
-            for file_key in hourly_files:
-                df = self.s3.read_parquet(file_key)
-                dfs.append(df)
-            
-            # Concatenate
-            compacted_df = pd.concat(dfs, ignore_index=True)
-            compacted_df = compacted_df.sort_values('datetime').reset_index(drop=True)
+            # Read all hourly files: 1 dataset scan (song song) → sort trong Arrow
+            compacted = self.s3.read_dataset(
+                hourly_files, schema=ELECTRICITY_SILVER_SCHEMA
+            ).sort_by('datetime')
             
             # Write daily file
             daily_key = self.s3.get_partition_path(
-                Config.ELECTRICITY_SILVER_PATH,
+                ELECTRICITY_SILVER_PATH,
                 date,
                 "data.parquet"
             )
             
-            self.s3.write_parquet(
-                compacted_df,
+            self.s3.write_table(
+                compacted,
                 daily_key,
-                compression=Config.PARQUET_COMPRESSION
+                compression=Config.PARQUET_COMPRESSION,
+                compression_level=Config.PARQUET_COMPRESSION_LEVEL
             )
             
-            logger.info(f"    ✅ Compacted {len(hourly_files)} files → {len(compacted_df)} rows")
+            logger.info(f"    ✅ Compacted {len(hourly_files)} files → {compacted.num_rows} rows")
             
             # Delete hourly files
-            deleted_count = 0
-            for file_key in hourly_files:
-                if self.s3.delete_file(file_key):
-                    deleted_count += 1
+            deleted_count = self.s3.delete_files(hourly_files)
             
             logger.info(f"    🗑️ Deleted {deleted_count}/{len(hourly_files)} hourly files")
             
@@ -221,7 +197,7 @@ class ProcessingCompactor:
                 "status": "success",
                 "date": date,
                 "files_compacted": len(hourly_files),
-                "rows": len(compacted_df),
+                "rows": compacted.num_rows,
                 "files_deleted": deleted_count
             }
             
@@ -245,42 +221,31 @@ class ProcessingCompactor:
         """
         logger.info(f"🗜️ Compact hourly Gold for {date}")
     
-        date_obj = pd.to_datetime(date)
-        year = date_obj.year
-        month = str(date_obj.month).zfill(2)
-        day = str(date_obj.day).zfill(2)
-    
-        partition_prefix = f"{Config.GOLD_CANONICAL_PATH}/year={year}/month={month}/day={day}/"
+        partition_prefix = self.s3.get_partition_prefix(GOLD_CANONICAL_PATH, date)
     
         try:
-            response = self.s3.s3_client.list_objects_v2(
-                Bucket=self.s3.bucket_name,
-                Prefix=partition_prefix
-            )
+            keys = self.s3.list_keys(partition_prefix)
         
-            if 'Contents' not in response:
+            if not keys:
                 return {"status": "no_files", "files_deleted": 0}
         
             # Find hourly files (HH_30.parquet)
             hourly_files = [
-                obj['Key'] for obj in response['Contents']
-                if '_30.parquet' in obj['Key']
+                key for key in keys
+                if '_30.parquet' in key
             ]
         
             if not hourly_files:
                 return {"status": "no_hourly_files", "files_deleted": 0}
         
-            # Check if daily file exists
+            # Check if daily file exists (đã có trong listing → không cần HEAD)
             daily_key = f"{partition_prefix}data.parquet"
-            if not self.s3.check_file_exists(daily_key):
+            if daily_key not in keys:
                 logger.warning(f"⚠️ Daily Gold file not found, skip deleting hourly files")
                 return {"status": "daily_not_found", "files_deleted": 0}
         
             # Delete hourly files (daily file now exists)
-            deleted_count = 0
-            for file_key in hourly_files:
-                if self.s3.delete_file(file_key):
-                    deleted_count += 1
+            deleted_count = self.s3.delete_files(hourly_files)
         
             logger.info(f"🗑️ Deleted {deleted_count}/{len(hourly_files)} hourly Gold files")
         
@@ -329,22 +294,19 @@ class ProcessingCompactor:
         
         # List daily Gold files
         month_str = str(month).zfill(2)
-        month_prefix = f"{Config.GOLD_CANONICAL_PATH}/year={year}/month={month_str}/"
+        month_prefix = f"{GOLD_CANONICAL_PATH}/year={year}/month={month_str}/"
         
         try:
-            response = self.s3.s3_client.list_objects_v2(
-                Bucket=self.s3.bucket_name,
-                Prefix=month_prefix
-            )
+            keys = self.s3.list_keys(month_prefix)
             
-            if 'Contents' not in response:
+            if not keys:
                 logger.warning(f"⚠️ No daily files found for {year}-{month:02d}")
                 return {"status": "no_files", "files_processed": 0}
             
             # Filter daily files (day=XX/data.parquet)
             daily_files = [
-                obj['Key'] for obj in response['Contents']
-                if 'day=' in obj['Key'] and obj['Key'].endswith('/data.parquet')
+                key for key in keys
+                if 'day=' in key and key.endswith('/data.parquet')
             ]
             
             if not daily_files:
@@ -364,37 +326,29 @@ class ProcessingCompactor:
                     "expected": expected_days
                 }
             
-            # Read all daily files
-            dfs = []
-            for file_key in daily_files:
-                df = self.s3.read_parquet(file_key)
-                dfs.append(df)
-            
-            # Concatenate
-            monthly_df = pd.concat(dfs, ignore_index=True)
-            monthly_df = monthly_df.sort_values('datetime').reset_index(drop=True)
-            
             # Write monthly file
             monthly_key = self.s3.get_monthly_path(
-                Config.GOLD_CANONICAL_PATH,
+                GOLD_CANONICAL_PATH,
                 year,
                 month,
                 "data.parquet"
             )
             
-            self.s3.write_parquet(
-                monthly_df,
+            # Stream daily files theo thứ tự day=01..DD: mỗi ngày Gold đã
+            # sorted và không overlap → append tuần tự giữ thứ tự datetime,
+            # không cần giữ cả tháng trong RAM để concat + sort
+            rows = self.s3.write_concatenated(
+                sorted(daily_files),
                 monthly_key,
-                compression=Config.PARQUET_COMPRESSION
+                compression=Config.PARQUET_COMPRESSION,
+                compression_level=Config.PARQUET_COMPRESSION_LEVEL,
+                schema=GOLD_CANONICAL_SCHEMA
             )
             
-            logger.info(f"  ✅ Compacted {len(daily_files)} days → {len(monthly_df)} rows")
+            logger.info(f"  ✅ Compacted {len(daily_files)} days → {rows} rows")
             
             # Delete daily files
-            deleted_count = 0
-            for file_key in daily_files:
-                if self.s3.delete_file(file_key):
-                    deleted_count += 1
+            deleted_count = self.s3.delete_files(daily_files)
             
             logger.info(f"  🗑️ Deleted {deleted_count}/{len(daily_files)} daily files")
             
@@ -403,7 +357,7 @@ class ProcessingCompactor:
                 "year": year,
                 "month": month,
                 "files_compacted": len(daily_files),
-                "rows": len(monthly_df),
+                "rows": rows,
                 "files_deleted": deleted_count,
                 "output": monthly_key
             }
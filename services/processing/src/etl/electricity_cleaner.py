@@ -4,12 +4,35 @@ etl/electricity_cleaner.py
 """
 import logging
 import pandas as pd
+import pyarrow as pa
 import pytz
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from etl._dedup import first_occurrence_mask
 
 logger = logging.getLogger(__name__)
 
+# Schema chuẩn của Electricity Silver (total_load): mọi hourly/daily file
+# ghi cùng kiểu → compactor đọc/concat không cần unify (promote) schema
+ELECTRICITY_SILVER_SCHEMA = pa.schema([
+    ('datetime', pa.timestamp('ns')),
+    ('total_load', pa.float32())
+])
+
+def _fixed_utc_offset(tz: pytz.BaseTzInfo) -> Optional[pd.Timedelta]:
+    """
+    UTC offset cố định của timezone (None nếu có DST)
+    
+    Asia/Ho_Chi_Minh là UTC+7 quanh năm → convert chỉ là cộng hằng số.
+    """
+    year = datetime.utcnow().year
+    winter, summer = datetime(year, 1, 1), datetime(year, 7, 1)
+    
+    offset = tz.utcoffset(winter)
+    if offset != tz.utcoffset(summer) or tz.dst(winter) or tz.dst(summer):
+        return None
+    return pd.Timedelta(offset)
+
 class ElectricityCleaner:
     """
     Physical Cleaning: Bronze → Silver
@@ -28,6 +51,7 @@ class ElectricityCleaner:
     ):
         self.source_tz = pytz.timezone(source_tz)
         self.target_tz = pytz.timezone(target_tz)
+        self._utc_offset = _fixed_utc_offset(self.target_tz)
     
     def clean(
         self,
@@ -48,6 +72,12 @@ class ElectricityCleaner:
         """
         logger.info(f"⚡ Cleaning {signal_name} data for {query_date}")
         
+        # Các signal khác không cần thiết cho Canonical Table → bỏ qua
+        # trước khi flatten/cast/dedup
+        if signal_name != 'total_load':
+            logger.info(f"  ⏭️ Skipping {signal_name} (not needed for Canonical Table)")
+            return pd.DataFrame()  # Return empty
+        
         # Step 1: Flattening
         df = self._flatten_json(raw_data, signal_name)
         logger.info(f"  → Flattened: {len(df)} records")
@@ -61,13 +91,8 @@ class ElectricityCleaner:
         logger.info(f"  → Deduplicated: {len(df)} rows")
         
         # Step 4: Column Selection (chỉ giữ total_load)
-        if signal_name == 'total_load':
-            df = self._select_columns(df, signal_name)
-            logger.info(f"  → Selected {len(df.columns)} columns")
-        else:
-            # Các signal khác không cần thiết cho Canonical Table
-            logger.info(f"  ⏭️ Skipping {signal_name} (not needed for Canonical Table)")
-            return pd.DataFrame()  # Return empty
+        df = self._select_columns(df, signal_name)
+        logger.info(f"  → Selected {len(df.columns)} columns")
         
         return df
     
@@ -90,8 +115,19 @@ class ElectricityCleaner:
                 logger.warning(f"⚠️ Empty data list for {signal_name}")
                 return pd.DataFrame()
             
-            # Convert to DataFrame
-            df = pd.DataFrame(data_list)
+            # Convert to DataFrame: build theo cột (dict-of-lists) thay vì
+            # để pandas duyệt từng dict record. Columns = union keys của mọi
+            # records theo thứ tự xuất hiện (như DataFrame(list of dicts))
+            keys = dict.fromkeys(key for record in data_list for key in record)
+            df = pd.DataFrame({
+                key: [record.get(key) for record in data_list]
+                for key in keys
+            })
+            
+            # value (MW) → float32 ngay khi parse: dedup/tz/concat phía sau
+            # chạy trên nửa số bytes
+            if 'value' in df.columns:
+                df['value'] = pd.to_numeric(df['value'], errors='coerce').astype('float32', copy=False)
             
             # Parse datetime
             if 'datetime' in df.columns:
@@ -116,17 +152,25 @@ class ElectricityCleaner:
             return df
         
         # Datetime: Convert UTC → UTC+7
-        if df['datetime'].dt.tz is None:
-            df['datetime'] = df['datetime'].dt.tz_localize('UTC')
+        if self._utc_offset is not None:
+            # Offset cố định: naive UTC + offset (1 phép cộng thay vì
+            # localize → convert → localize, mỗi bước một array mới)
+            utc = df['datetime']
+            if utc.dt.tz is not None:
+                utc = utc.dt.tz_convert(None)
+            df['datetime'] = utc + self._utc_offset
         else:
-            df['datetime'] = df['datetime'].dt.tz_convert('UTC')
-        
-        df['datetime'] = df['datetime'].dt.tz_convert(self.target_tz)
-        df['datetime'] = df['datetime'].dt.tz_localize(None)
+            if df['datetime'].dt.tz is None:
+                df['datetime'] = df['datetime'].dt.tz_localize('UTC')
+            else:
+                df['datetime'] = df['datetime'].dt.tz_convert('UTC')
+            
+            df['datetime'] = df['datetime'].dt.tz_convert(self.target_tz)
+            df['datetime'] = df['datetime'].dt.tz_localize(None)
         
-        # Numeric: value column
+        # Numeric: value column (đã float32 từ _flatten_json → no-op)
         if 'value' in df.columns:
-            df['value'] = pd.to_numeric(df['value'], errors='coerce').astype('float32')
+            df['value'] = df['value'].astype('float32', copy=False)
         
         return df
     
@@ -135,12 +179,16 @@ class ElectricityCleaner:
         Deduplication: Loại bỏ dòng trùng lặp
         
         Keep first occurrence, drop duplicates by datetime
+        
+        first_occurrence_mask (stable argsort) thay cho drop_duplicates:
+        không build hash table, giữ thứ tự gốc và index labels.
         """
         if df.empty:
             return df
         
         initial_len = len(df)
-        df = df.drop_duplicates(subset=['datetime'], keep='first')
+        keep = first_occurrence_mask(df['datetime'].to_numpy())
+        df = df[keep]
         
         removed = initial_len - len(df)
         if removed > 0:
@@ -4,12 +4,29 @@ etl/weather_cleaner.py
 """
 import logging
 import pandas as pd
+import pyarrow as pa
 import pytz
 from datetime import datetime
 from typing import Dict, Any
+from etl._dedup import first_occurrence_mask
 
 logger = logging.getLogger(__name__)
 
+# Fields của mỗi hour record cần cho Silver (còn lại: conditions, icon,
+# stations... là object columns bị _select_columns vứt bỏ)
+_SOURCE_FIELDS = ('datetime', 'temp', 'humidity', 'precip', 'windspeed', 'cloudcover')
+
+# Schema chuẩn của Weather Silver: mọi hourly/daily file ghi cùng kiểu
+# → compactor đọc/concat không cần unify (promote) schema
+WEATHER_SILVER_SCHEMA = pa.schema([
+    ('datetime', pa.timestamp('ns')),
+    ('temperature', pa.float32()),
+    ('humidity', pa.float32()),
+    ('precipitation', pa.float32()),
+    ('wind_speed', pa.float32()),
+    ('cloud_cover', pa.float32())
+])
+
 class WeatherCleaner:
     """
     Physical Cleaning: Bronze → Silver
@@ -77,8 +94,12 @@ class WeatherCleaner:
             if not hours:
                 raise ValueError("No 'hours' field in day data")
             
-            # Convert to DataFrame
-            df = pd.DataFrame(hours)
+            # Convert to DataFrame: chỉ parse fields cần thiết, build theo
+            # cột (dict-of-lists) thay vì để pandas duyệt từng dict record.
+            # Field có ở bất kỳ hour nào (không chỉ hour đầu) → giữ, thiếu → None
+            present = set().union(*hours)
+            fields = [f for f in _SOURCE_FIELDS if f in present]
+            df = pd.DataFrame({f: [hour.get(f) for hour in hours] for f in fields})
             
             # Create full datetime: date + hour
             df['hour'] = pd.to_datetime(df['datetime'], format='%H:%M:%S').dt.hour
@@ -116,7 +137,7 @@ class WeatherCleaner:
         
         for col, dtype in numeric_cols.items():
             if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype, copy=False)
         
         return df
     
@@ -125,9 +146,16 @@ class WeatherCleaner:
         Deduplication: Loại bỏ dòng trùng lặp
         
         Keep first occurrence, drop duplicates by datetime
+        
+        first_occurrence_mask (stable argsort) thay cho drop_duplicates:
+        không build hash table, giữ thứ tự gốc và index labels.
         """
         initial_len = len(df)
-        df = df.drop_duplicates(subset=['datetime'], keep='first')
+        if initial_len == 0:
+            return df
+        
+        keep = first_occurrence_mask(df['datetime'].to_numpy())
+        df = df[keep]
         
         removed = initial_len - len(df)
         if removed > 0:
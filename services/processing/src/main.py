@@ -9,10 +9,17 @@ import sys
 from datetime import datetime, timedelta
 from typing import List
 
-from config import Config
+from config import (
+    Config,
+    WEATHER_BRONZE_PATH,
+    WEATHER_SILVER_PATH,
+    ELECTRICITY_BRONZE_PATH,
+    ELECTRICITY_SILVER_PATH,
+    GOLD_CANONICAL_PATH
+)
 from s3_connector import S3Connector
-from etl.weather_cleaner import WeatherCleaner
-from etl.electricity_cleaner import ElectricityCleaner
+from etl.weather_cleaner import WeatherCleaner, WEATHER_SILVER_SCHEMA
+from etl.electricity_cleaner import ElectricityCleaner, ELECTRICITY_SILVER_SCHEMA
 from etl.canonical_merger import CanonicalMerger
 from etl.compactor import ProcessingCompactor
 
@@ -61,14 +68,14 @@ def process_weather_bronze_to_silver(
         if hour is not None:
             # HOURLY mode: Read HH_30.json
             bronze_key = s3.get_partition_path(
-                Config.WEATHER_BRONZE_PATH,
+                WEATHER_BRONZE_PATH,
                 date,
                 hour=hour  # Will generate: .../HH_30.json
             )
         else:
             # BACKFILL mode: Read data.json
             bronze_key = s3.get_partition_path(
-                Config.WEATHER_BRONZE_PATH,
+                WEATHER_BRONZE_PATH,
                 date,
                 "data.json"
             )
@@ -84,11 +91,11 @@ def process_weather_bronze_to_silver(
         # Write Silver data
         if hour is not None:
             # HOURLY mode: Write to HH_30.parquet
-            silver_key = f"{Config.WEATHER_SILVER_PATH}/year={date[:4]}/month={date[5:7]}/day={date[8:10]}/{hour}_30.parquet"
+            silver_key = f"{WEATHER_SILVER_PATH}/year={date[:4]}/month={date[5:7]}/day={date[8:10]}/{hour}_30.parquet"
         else:
             # BACKFILL mode: Write to data.parquet
             silver_key = s3.get_partition_path(
-                Config.WEATHER_SILVER_PATH,
+                WEATHER_SILVER_PATH,
                 date,
                 "data.parquet"
             )
@@ -96,7 +103,9 @@ def process_weather_bronze_to_silver(
         s3.write_parquet(
             cleaned_df,
             silver_key,
-            compression=Config.PARQUET_COMPRESSION
+            compression=Config.PARQUET_COMPRESSION,
+            compression_level=Config.PARQUET_COMPRESSION_LEVEL,
+            schema=WEATHER_SILVER_SCHEMA
         )
         
         logger.info(f"✅ Weather Silver: {len(cleaned_df)} rows → {silver_key}")
@@ -130,14 +139,14 @@ def process_electricity_bronze_to_silver(
         if hour is not None:
             # HOURLY mode: Read HH_30.json
             bronze_key = s3.get_partition_path(
-                f"{Config.ELECTRICITY_BRONZE_PATH}/{signal}",
+                f"{ELECTRICITY_BRONZE_PATH}/{signal}",
                 date,
                 hour=hour
             )
         else:
             # BACKFILL mode: Read data.json
             bronze_key = s3.get_partition_path(
-                f"{Config.ELECTRICITY_BRONZE_PATH}/{signal}",
+                f"{ELECTRICITY_BRONZE_PATH}/{signal}",
                 date,
                 "data.json"
             )
@@ -158,11 +167,11 @@ def process_electricity_bronze_to_silver(
         # Write Silver data
         if hour is not None:
             # HOURLY mode: Write to HH_30.parquet
-            silver_key = f"{Config.ELECTRICITY_SILVER_PATH}/year={date[:4]}/month={date[5:7]}/day={date[8:10]}/{hour}_30.parquet"
+            silver_key = f"{ELECTRICITY_SILVER_PATH}/year={date[:4]}/month={date[5:7]}/day={date[8:10]}/{hour}_30.parquet"
         else:
             # BACKFILL mode: Write to data.parquet
             silver_key = s3.get_partition_path(
-                Config.ELECTRICITY_SILVER_PATH,
+                ELECTRICITY_SILVER_PATH,
                 date,
                 "data.parquet"
             )
@@ -170,7 +179,9 @@ def process_electricity_bronze_to_silver(
         s3.write_parquet(
             cleaned_df,
             silver_key,
-            compression=Config.PARQUET_COMPRESSION
+            compression=Config.PARQUET_COMPRESSION,
+            compression_level=Config.PARQUET_COMPRESSION_LEVEL,
+            schema=ELECTRICITY_SILVER_SCHEMA
         )
         
         logger.info(f"✅ Electricity Silver: {len(cleaned_df)} rows → {silver_key}")
@@ -202,7 +213,7 @@ def process_silver_to_canonical(
             
             # Read Weather Silver (daily file)
             weather_key = s3.get_partition_path(
-                Config.WEATHER_SILVER_PATH,
+                WEATHER_SILVER_PATH,
                 date,
                 "data.parquet"
             )
@@ -215,7 +226,7 @@ def process_silver_to_canonical(
             
             # Read Electricity Silver (daily file)
             elec_key = s3.get_partition_path(
-                Config.ELECTRICITY_SILVER_PATH,
+                ELECTRICITY_SILVER_PATH,
                 date,
                 "data.parquet"
             )
@@ -232,7 +243,7 @@ def process_silver_to_canonical(
             
             # Write daily Gold file
             gold_key = s3.get_partition_path(
-                Config.GOLD_CANONICAL_PATH,
+                GOLD_CANONICAL_PATH,
                 date,
                 "data.parquet"
             )
@@ -240,7 +251,8 @@ def process_silver_to_canonical(
             s3.write_parquet(
                 canonical_df,
                 gold_key,
-                compression=Config.PARQUET_COMPRESSION
+                compression=Config.PARQUET_COMPRESSION,
+                compression_level=Config.PARQUET_COMPRESSION_LEVEL
             )
             
             logger.info(f"    ✅ Canonical: {len(canonical_df)} rows → {gold_key}")
@@ -275,7 +287,7 @@ def process_hourly_silver_to_gold(
         logger.info(f"🌟 Creating hourly Gold: {date} {hour}:00")
         
         # Read Weather Silver (hourly)
-        weather_key = f"{Config.WEATHER_SILVER_PATH}/year={date[:4]}/month={date[5:7]}/day={date[8:10]}/{hour}_30.parquet"
+        weather_key = f"{WEATHER_SILVER_PATH}/year={date[:4]}/month={date[5:7]}/day={date[8:10]}/{hour}_30.parquet"
         
         if not s3.check_file_exists(weather_key):
             logger.warning(f"⚠️ Weather Silver not found: {weather_key}")
@@ -284,7 +296,7 @@ def process_hourly_silver_to_gold(
         weather_df = s3.read_parquet(weather_key)
         
         # Read Electricity Silver (hourly)
-        elec_key = f"{Config.ELECTRICITY_SILVER_PATH}/year={date[:4]}/month={date[5:7]}/day={date[8:10]}/{hour}_30.parquet"
+        elec_key = f"{ELECTRICITY_SILVER_PATH}/year={date[:4]}/month={date[5:7]}/day={date[8:10]}/{hour}_30.parquet"
         
         if not s3.check_file_exists(elec_key):
             logger.warning(f"⚠️ Electricity Silver not found: {elec_key}")
@@ -297,12 +309,13 @@ def process_hourly_silver_to_gold(
         merger.validate_canonical(canonical_df)
         
         # Write hourly Gold file
-        gold_key = f"{Config.GOLD_CANONICAL_PATH}/year={date[:4]}/month={date[5:7]}/day={date[8:10]}/{hour}_30.parquet"
+        gold_key = f"{GOLD_CANONICAL_PATH}/year={date[:4]}/month={date[5:7]}/day={date[8:10]}/{hour}_30.parquet"
         
         s3.write_parquet(
             canonical_df,
             gold_key,
-            compression=Config.PARQUET_COMPRESSION
+            compression=Config.PARQUET_COMPRESSION,
+            compression_level=Config.PARQUET_COMPRESSION_LEVEL
         )
         
         logger.info(f"✅ Hourly Gold: {len(canonical_df)} rows → {gold_key}")
@@ -521,15 +534,13 @@ def run_compaction_monthly_mode():
 def main():
     """Main orchestrator"""
     try:
-        # Print banner
-        print(Config.get_summary())
-        
-        # Validate config
+        # Validate config (một lần, trước mọi truy cập MODE)
         logger.info("🔍 Validating configuration...")
-        Config.validate()
+        mode = Config.validate_at_startup()
         logger.info("✅ Config OK")
         
-        mode = Config.get_mode()
+        # Print banner
+        print(Config.get_summary())
         
         # Route to appropriate mode handler
         if mode == "BACKFILL":
@@ -7,13 +7,68 @@ import json
 import logging
 import boto3
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
 from io import BytesIO
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Optional
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 
+# Codecs nhận compression_level (snappy / lz4 thì không)
+_LEVELED_CODECS = frozenset({'zstd', 'gzip', 'brotli'})
+
+# Giới hạn keys cho mỗi request DeleteObjects của S3
+_DELETE_BATCH_SIZE = 1000
+
+def _parquet_write_options(compression: str, compression_level: Optional[int]) -> dict:
+    """
+    Options cho pq.write_table / pq.ParquetWriter
+    
+    Dictionary encoding + page 1 MiB + statistics (predicate pushdown)
+    """
+    write_options = {
+        'compression': compression,
+        'use_dictionary': True,
+        'data_page_size': 1 << 20,
+        'write_statistics': True
+    }
+    if compression_level is not None and compression in _LEVELED_CODECS:
+        write_options['compression_level'] = compression_level
+    return write_options
+
+def _conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Select + cast table theo schema (thứ tự columns của schema)
+    
+    Column thiếu → null column; dtype lệch (float64 vs float32) → cast.
+    """
+    if table.schema.equals(schema):
+        return table
+    
+    columns = [
+        table.column(field.name).cast(field.type)
+        if field.name in table.column_names
+        else pa.nulls(table.num_rows, type=field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+@lru_cache(maxsize=1024)
+def _partition_prefix(prefix: str, date: str) -> str:
+    """
+    Hive partition prefix của một ngày: prefix/year=YYYY/month=MM/day=DD
+    
+    Parse date + format một lần cho mỗi (prefix, date): backfill build
+    nhiều keys (list, hourly files, delete) trên cùng partition.
+    """
+    date_obj = datetime.strptime(date, "%Y-%m-%d")
+    return f"{prefix}/year={date_obj.year}/month={date_obj.month:02d}/day={date_obj.day:02d}"
+
 class S3Connector:
     """
     Class để đọc và ghi dữ liệu từ/lên S3
@@ -32,6 +87,7 @@ class S3Connector:
         self.s3_client = boto3.client('s3')
         self.s3_resource = boto3.resource('s3')
         self.bucket = self.s3_resource.Bucket(bucket_name)
+        self._arrow_fs = None
         
         logger.info(f"📦 Initialized S3Connector for bucket: {bucket_name}")
     
@@ -69,7 +125,9 @@ class S3Connector:
         self,
         df: pd.DataFrame,
         s3_key: str,
-        compression: str = "snappy"
+        compression: str = "snappy",
+        compression_level: Optional[int] = None,
+        schema: Optional[pa.Schema] = None
     ) -> str:
         """
         Ghi DataFrame lên S3 dưới dạng Parquet
@@ -77,7 +135,54 @@ class S3Connector:
         Args:
             df: Pandas DataFrame
             s3_key: S3 key path
-            compression: Compression method (snappy, gzip)
+            compression: Compression method (snappy, zstd, gzip)
+            compression_level: Level cho zstd/gzip/brotli (None = mặc định)
+            schema: Schema chuẩn (None = infer từ df). Column ngoài schema
+                    → ValueError; column của schema thiếu trong df → ghi
+                    null (có warning)
+        
+        Returns:
+            str: S3 URI
+        """
+        try:
+            if schema is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+            else:
+                extra = set(df.columns) - set(schema.names)
+                if extra:
+                    raise ValueError(f"Columns not in schema: {sorted(extra)}")
+                
+                missing = [name for name in schema.names if name not in df.columns]
+                if missing:
+                    logger.warning(f"⚠️ Columns missing from DataFrame, written as null: {missing}")
+                
+                table = pa.Table.from_pandas(
+                    df,
+                    schema=pa.schema([schema.field(col) for col in df.columns]),
+                    preserve_index=False
+                )
+                table = _conform_table(table, schema)
+        except Exception as e:
+            logger.error(f"❌ Failed to write Parquet: {e}")
+            raise
+        
+        return self.write_table(table, s3_key, compression, compression_level)
+    
+    def write_table(
+        self,
+        table: pa.Table,
+        s3_key: str,
+        compression: str = "snappy",
+        compression_level: Optional[int] = None
+    ) -> str:
+        """
+        Ghi Arrow Table lên S3 dưới dạng Parquet (không qua pandas)
+        
+        Args:
+            table: PyArrow Table
+            s3_key: S3 key path
+            compression: Compression method (snappy, zstd, gzip)
+            compression_level: Level cho zstd/gzip/brotli (None = mặc định)
         
         Returns:
             str: S3 URI
@@ -85,40 +190,118 @@ class S3Connector:
         try:
             logger.debug(f"💾 Writing Parquet: s3://{self.bucket_name}/{s3_key}")
             
-            # Convert DataFrame to Parquet in memory
+            # Convert Table to Parquet in memory
             parquet_buffer = BytesIO()
-            df.to_parquet(
+            pq.write_table(
+                table,
                 parquet_buffer,
-                engine='pyarrow',
-                compression=compression,
-                index=False
+                **_parquet_write_options(compression, compression_level)
             )
             
-            # Upload to S3
-            parquet_buffer.seek(0)
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=parquet_buffer.getvalue(),
-                ContentType='application/octet-stream',
-                Metadata={
-                    'format': 'parquet',
-                    'compression': compression,
-                    'rows': str(len(df)),
-                    'columns': str(len(df.columns)),
-                    'written_at': datetime.utcnow().isoformat()
-                }
+            return self._upload_parquet(
+                parquet_buffer, s3_key, compression, table.num_rows, table.num_columns
             )
             
-            s3_uri = f"s3://{self.bucket_name}/{s3_key}"
-            logger.info(f"✅ Written {len(df)} rows to {s3_uri}")
+        except Exception as e:
+            logger.error(f"❌ Failed to write Parquet: {e}")
+            raise
+    
+    def write_concatenated(
+        self,
+        s3_keys: List[str],
+        s3_key: str,
+        compression: str = "snappy",
+        compression_level: Optional[int] = None,
+        schema: Optional[pa.Schema] = None
+    ) -> int:
+        """
+        Stream-concat nhiều Parquet files thành 1 file (ParquetWriter)
+        
+        Đọc từng file và append thành row groups → peak memory ≈ 1 input
+        file + output buffer (không giữ list tables + bản concat). Output
+        giữ đúng thứ tự s3_keys: caller đảm bảo các files đã sorted và
+        không overlap (e.g. day=01..31 của Gold). Mỗi file được cast về
+        cùng một schema trước khi append (ParquetWriter yêu cầu schema
+        khớp tuyệt đối).
+        
+        Args:
+            s3_keys: Input S3 keys (theo thứ tự output)
+            s3_key: Output S3 key
+            compression: Compression method (snappy, zstd, gzip)
+            compression_level: Level cho zstd/gzip/brotli (None = mặc định)
+            schema: Schema chuẩn của output (None = schema file đầu tiên)
+        
+        Returns:
+            int: Số rows đã ghi
+        """
+        try:
+            logger.debug(f"💾 Stream-writing Parquet: s3://{self.bucket_name}/{s3_key}")
+            
+            parquet_buffer = BytesIO()
+            writer = None
+            num_rows = 0
+            
+            try:
+                for key in s3_keys:
+                    table = pq.read_table(
+                        f"{self.bucket_name}/{key}", filesystem=self.arrow_fs
+                    )
+                    if writer is None:
+                        writer = pq.ParquetWriter(
+                            parquet_buffer,
+                            schema if schema is not None else table.schema,
+                            **_parquet_write_options(compression, compression_level)
+                        )
+                    
+                    extra = set(table.column_names) - set(writer.schema.names)
+                    if extra:
+                        logger.warning(f"⚠️ Dropping columns not in schema from {key}: {sorted(extra)}")
+                    writer.write_table(_conform_table(table, writer.schema))
+                    num_rows += table.num_rows
+            finally:
+                if writer is not None:
+                    writer.close()
             
-            return s3_uri
+            if writer is None:
+                return 0
+            
+            self._upload_parquet(
+                parquet_buffer, s3_key, compression, num_rows, len(writer.schema)
+            )
+            return num_rows
             
         except Exception as e:
-            logger.error(f"❌ Failed to write Parquet: {e}")
+            logger.error(f"❌ Failed to stream-write Parquet: {e}")
             raise
     
+    def _upload_parquet(
+        self,
+        parquet_buffer: BytesIO,
+        s3_key: str,
+        compression: str,
+        num_rows: int,
+        num_columns: int
+    ) -> str:
+        """Upload Parquet buffer lên S3 kèm metadata"""
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            Body=parquet_buffer.getvalue(),
+            ContentType='application/octet-stream',
+            Metadata={
+                'format': 'parquet',
+                'compression': compression,
+                'rows': str(num_rows),
+                'columns': str(num_columns),
+                'written_at': datetime.utcnow().isoformat()
+            }
+        )
+        
+        s3_uri = f"s3://{self.bucket_name}/{s3_key}"
+        logger.info(f"✅ Written {num_rows} rows to {s3_uri}")
+        
+        return s3_uri
+    
     def read_parquet(self, s3_key: str) -> pd.DataFrame:
         """
         Đọc Parquet file từ S3
@@ -132,9 +315,14 @@ class S3Connector:
         try:
             logger.debug(f"📖 Reading Parquet: s3://{self.bucket_name}/{s3_key}")
             
-            # Read directly from S3
+            # Read directly from S3 qua S3FileSystem đã cache (không resolve
+            # filesystem/region lại cho mỗi URI như pd.read_parquet)
             s3_uri = f"s3://{self.bucket_name}/{s3_key}"
-            df = pd.read_parquet(s3_uri)
+            df = pq.read_table(
+                f"{self.bucket_name}/{s3_key}",
+                filesystem=self.arrow_fs,
+                use_threads=True
+            ).to_pandas()
             
             logger.info(f"✅ Read {len(df)} rows from {s3_uri}")
             return df
@@ -143,6 +331,66 @@ class S3Connector:
             logger.error(f"❌ Failed to read Parquet: {e}")
             raise
     
+    @property
+    def arrow_fs(self) -> pafs.FileSystem:
+        """
+        PyArrow S3FileSystem cho bucket (tạo lazy, resolve region một lần)
+        """
+        if self._arrow_fs is None:
+            self._arrow_fs, _ = pafs.FileSystem.from_uri(f"s3://{self.bucket_name}")
+        return self._arrow_fs
+    
+    def read_dataset(
+        self,
+        s3_keys: List[str],
+        schema: Optional[pa.Schema] = None
+    ) -> pa.Table:
+        """
+        Đọc nhiều Parquet files thành 1 Arrow Table qua pyarrow.dataset
+        
+        Scanner của dataset đọc các files song song (multi-threaded, native
+        S3 I/O) và gộp thành 1 Table trong một lần to_table() — thay cho
+        list → read từng file → concat.
+        
+        Args:
+            s3_keys: List S3 keys (đã filter, e.g. HH_30.parquet)
+            schema: Schema chuẩn (None = lấy từ file đầu tiên)
+        
+        Returns:
+            pa.Table: Data của tất cả files
+        """
+        try:
+            paths = [f"{self.bucket_name}/{key}" for key in s3_keys]
+            dataset = ds.dataset(
+                paths, schema=schema, filesystem=self.arrow_fs, format="parquet"
+            )
+            table = dataset.to_table(use_threads=True)
+            
+            logger.debug(f"📖 Read {table.num_rows} rows from {len(s3_keys)} files")
+            return table
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to read Parquet dataset: {e}")
+            raise
+    
+    def list_keys(self, prefix: str) -> List[str]:
+        """
+        List tất cả keys dưới prefix (paginated)
+        
+        list_objects_v2 trả tối đa 1000 keys / response → dùng paginator
+        để không bỏ sót files ở các trang sau.
+        
+        Args:
+            prefix: S3 prefix (e.g., "silver/weather/year=2024/month=01/")
+        
+        Returns:
+            List[str]: S3 keys
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix)
+        
+        return [obj['Key'] for page in pages for obj in page.get('Contents', [])]
+    
     def list_hourly_bronze_files(self, prefix: str, date: str) -> List[str]:
         """
         List tất cả hourly Bronze files (HH_30.json) của 1 ngày
@@ -154,12 +402,7 @@ class S3Connector:
         Returns:
             List[str]: Sorted list of S3 keys (HH_30.json files)
         """
-        date_obj = datetime.strptime(date, "%Y-%m-%d")
-        year = date_obj.year
-        month = str(date_obj.month).zfill(2)
-        day = str(date_obj.day).zfill(2)
-        
-        partition_prefix = f"{prefix}/year={year}/month={month}/day={day}/"
+        partition_prefix = self.get_partition_prefix(prefix, date)
         
         try:
             response = self.s3_client.list_objects_v2(
@@ -255,10 +498,7 @@ class S3Connector:
         Returns:
             str: Full S3 key
         """
-        date_obj = datetime.strptime(date, "%Y-%m-%d")
-        year = date_obj.year
-        month = str(date_obj.month).zfill(2)
-        day = str(date_obj.day).zfill(2)
+        partition = _partition_prefix(prefix, date)
         
         if hour is not None:
             # Hourly file: prefix/year=YYYY/month=MM/day=DD/HH_30.json
@@ -266,10 +506,23 @@ class S3Connector:
             # For Bronze (JSON): use .json, for Silver/Gold (Parquet): use .parquet
             # Caller should pass the correct filename
             ext = filename.split('.')[-1] if '.' in filename else 'parquet'
-            return f"{prefix}/year={year}/month={month}/day={day}/{hour}_30.{ext}"
+            return f"{partition}/{hour}_30.{ext}"
         else:
             # Daily file: prefix/year=YYYY/month=MM/day=DD/data.parquet
-            return f"{prefix}/year={year}/month={month}/day={day}/{filename}"
+            return f"{partition}/{filename}"
+    
+    def get_partition_prefix(self, prefix: str, date: str) -> str:
+        """
+        Prefix của partition 1 ngày (dùng cho list / delete)
+        
+        Args:
+            prefix: S3 prefix (e.g., "silver/weather")
+            date: Date string (YYYY-MM-DD)
+        
+        Returns:
+            str: prefix/year=YYYY/month=MM/day=DD/ (cached theo (prefix, date))
+        """
+        return f"{_partition_prefix(prefix, date)}/"
     
     def get_monthly_path(
         self,
@@ -301,12 +554,7 @@ class S3Connector:
             prefix: S3 prefix
             date: Date string (YYYY-MM-DD)
         """
-        date_obj = datetime.strptime(date, "%Y-%m-%d")
-        year = date_obj.year
-        month = str(date_obj.month).zfill(2)
-        day = str(date_obj.day).zfill(2)
-        
-        partition_prefix = f"{prefix}/year={year}/month={month}/day={day}/"
+        partition_prefix = self.get_partition_prefix(prefix, date)
         
         logger.info(f"🗑️ Deleting partition: {partition_prefix}")
         
@@ -348,18 +596,45 @@ class S3Connector:
         except ClientError as e:
             logger.error(f"❌ Error deleting {s3_key}: {str(e)}")
             return False
+    
+    def delete_files(self, s3_keys: List[str]) -> int:
+        """
+        Xóa nhiều files bằng DeleteObjects (tối đa 1000 keys / request)
+        
+        Thay cho vòng lặp delete_file: N round-trips → ceil(N/1000)
+        
+        Args:
+            s3_keys: List S3 keys
+        
+        Returns:
+            int: Số files xóa thành công
+        """
+        deleted_count = 0
+        
+        for start in range(0, len(s3_keys), _DELETE_BATCH_SIZE):
+            batch = s3_keys[start:start + _DELETE_BATCH_SIZE]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch]}
+                )
+            except ClientError as e:
+                logger.error(f"❌ Error deleting {len(batch)} files: {str(e)}")
+                continue
+            
+            deleted_count += len(response.get('Deleted', []))
+            for error in response.get('Errors', []):
+                logger.error(f"❌ Error deleting {error.get('Key')}: {error.get('Message')}")
+        
+        logger.debug(f"🗑️ Deleted {deleted_count}/{len(s3_keys)} files")
+        return deleted_count
 
     def list_hourly_silver_files(self, prefix: str, date: str) -> List[str]:
     
         """
         List all hourly Silver files (HH_30.parquet) for a given day
         """
-        date_obj = datetime.strptime(date, "%Y-%m-%d")
-        year = date_obj.year
-        month = str(date_obj.month).zfill(2)
-        day = str(date_obj.day).zfill(2)
-    
-        partition_prefix = f"{prefix}/year={year}/month={month}/day={day}/"
+        partition_prefix = self.get_partition_prefix(prefix, date)
     
         response = self.s3_client.list_objects_v2(
             Bucket=self.bucket_name,